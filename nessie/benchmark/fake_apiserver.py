@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+# Stand-in Kubernetes API server for benchmarking Nessie without a cluster
+# Serves synthetic namespaces, pods, container logs, node and pod metrics and deployments,
+# plus followed log streams and pod watches for daemon mode, and node collection Jobs
+# (run as local node agents, reachable through pods/exec) for coordinator mode
+
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import os
+import queue
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+NAMESPACES = ["kube-system", "cattle-system", "kubevirt", "metallb-system", "cdi", "default"]
+CONTAINERS = ["main", "sidecar"]
+NODE_NAME = "bench-node-0"
+POD_PLACEHOLDER = "@POD@"
+NODE_AGENT_LOG_DIR = "/tmp/nessie-node"
+BIN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bin")
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Deployments that Nessie resolves component versions from
+DEPLOYMENTS = {
+    "cattle-system": [("system-upgrade-controller", ["registry.rancher.com/rancher/system-upgrade-controller:v0.14.2"])],
+    "kubevirt": [("virt-operator", ["registry.suse.com/suse/sles/15.6/virt-operator:1.3.1"])],
+    "metallb-system": [("metallb-controller", ["registry.suse.com/edge/3.1/metallb-controller:v0.14.8"])],
+    "cdi": [("cdi-operator", ["registry.suse.com/suse/sles/15.6/cdi-operator:1.60.1"])],
+}
+
+
+def build_pod(i):
+    """Returns synthetic pod number i, placed round-robin over the synthetic namespaces"""
+    return {
+        "metadata": {
+            "name": f"bench-pod-{i:05d}",
+            "namespace": NAMESPACES[i % len(NAMESPACES)],
+            "uid": f"00000000-0000-0000-0000-{i:012d}",
+        },
+        "spec": {"nodeName": NODE_NAME, "containers": [{"name": c, "image": "bench:latest"} for c in CONTAINERS]},
+        "status": {"phase": "Running"},
+    }
+
+
+def build_pods(count):
+    return [build_pod(i) for i in range(count)]
+
+
+class PodStore:
+    """Holds the live pods, replacing the oldest one at every churn and telling watchers"""
+
+    def __init__(self, count):
+        self.lock = threading.Lock()
+        self.pods = build_pods(count)
+        self.next_index = count
+        self.resource_version = 1
+        self.watchers = []
+
+    def items(self):
+        with self.lock:
+            return list(self.pods), str(self.resource_version)
+
+    def is_live(self, name):
+        with self.lock:
+            return any(pod["metadata"]["name"] == name for pod in self.pods)
+
+    def watch(self):
+        events = queue.Queue()
+        with self.lock:
+            self.watchers.append(events)
+        return events
+
+    def unwatch(self, events):
+        with self.lock:
+            self.watchers.remove(events)
+
+    def churn(self):
+        with self.lock:
+            if not self.pods:
+                return
+            deleted = self.pods.pop(0)
+            added = build_pod(self.next_index)
+            self.next_index += 1
+            self.pods.append(added)
+            self.resource_version += 1
+            for events in self.watchers:
+                events.put(("DELETED", deleted))
+                events.put(("ADDED", added))
+
+
+class JobRunner:
+    """Runs each created Job as a local Nessie node agent with its own log directory
+
+    The agent's pod is reported as Running for as long as the process lives, and exec
+    commands are run locally with the agent's log directory substituted for the pod's.
+    """
+
+    def __init__(self, nessie, workdir):
+        self.nessie = nessie
+        self.workdir = workdir
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    def create(self, namespace, job):
+        name = job["metadata"]["name"]
+        container = job["spec"]["template"]["spec"]["containers"][0]
+        log_dir = os.path.join(self.workdir, name)
+        env = dict(os.environ)
+        env.update({item["name"]: item["value"] for item in container.get("env", [])})
+        env.update({"NESSIE_LOG_DIR": log_dir, "PATH": f"{BIN_DIR}{os.pathsep}{env.get('PATH', '')}"})
+        env.pop("KUBECONFIG", None)
+        with open(os.path.join(self.workdir, f"{name}.log"), "wb") as log:
+            process = subprocess.Popen([sys.executable, self.nessie], env=env, stdout=log, stderr=log)
+        pod = {
+            "metadata": {
+                "name": f"{name}-{hashlib.sha1(name.encode()).hexdigest()[:5]}",
+                "namespace": namespace,
+                "uid": hashlib.sha1(name.encode()).hexdigest(),
+                "labels": {"job-name": name},
+            },
+            "spec": job["spec"]["template"]["spec"],
+            "status": {},
+        }
+        with self.lock:
+            self.jobs[name] = {"process": process, "pod": pod, "log_dir": log_dir}
+
+    def delete(self, name):
+        with self.lock:
+            job = self.jobs.pop(name, None)
+        if job and job["process"].poll() is None:
+            job["process"].send_signal(signal.SIGTERM)
+        return job is not None
+
+    def pods(self, job_name):
+        with self.lock:
+            job = self.jobs.get(job_name)
+        if not job:
+            return []
+        code = job["process"].poll()
+        job["pod"]["status"] = {"phase": "Running" if code is None else "Succeeded" if code == 0 else "Failed"}
+        return [job["pod"]]
+
+    def exec_command(self, pod_name, command):
+        with self.lock:
+            job = next((job for job in self.jobs.values() if job["pod"]["metadata"]["name"] == pod_name), None)
+        if not job:
+            return None
+        return [arg.replace(NODE_AGENT_LOG_DIR, job["log_dir"]) for arg in command]
+
+
+@lru_cache(maxsize=64)
+def log_template(container, lines, line_bytes, timestamps, secret_every=0):
+    """Generates a container log once per shape, with a placeholder for the pod name"""
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    output = []
+    for i in range(lines):
+        prefix = f"{(start + timedelta(milliseconds=i)).strftime('%Y-%m-%dT%H:%M:%S.%f')}000Z " if timestamps else ""
+        level = "error" if i % 50 == 0 else "info"
+        line = f'{prefix}level={level} pod={POD_PLACEHOLDER} container={container} seq={i} msg="synthetic benchmark line"'
+        if secret_every and i % secret_every == secret_every - 1:
+            line = f'{prefix}level=debug pod={POD_PLACEHOLDER} container={container} seq={i} msg="login" password=bench{i:08x}'
+        output.append(line.ljust(line_bytes - 1, "."))
+    return ("\n".join(output) + "\n").encode() if output else b""
+
+
+def log_body(pod, container, lines, line_bytes, timestamps, secret_every=0):
+    """Returns a container log of the requested number of lines"""
+    template = log_template(container, lines, line_bytes, timestamps, secret_every)
+    return template.replace(POD_PLACEHOLDER.encode(), pod.encode())
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    """Answers the subset of the Kubernetes API that Nessie uses"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "nessie-bench"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type="application/json", status=200):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def send_chunked(self, chunks, content_type):
+        """Sends a chunked response, as the API server does for watches and followed logs"""
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for chunk in chunks:
+                if chunk:
+                    self.send_chunk(chunk)
+            self.send_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def send_frame(self, payload, opcode=0x2):
+        """Sends an unmasked websocket frame"""
+        length = len(payload)
+        if length < 126:
+            header = bytes([0x80 | opcode, length])
+        elif length < 65536:
+            header = bytes([0x80 | opcode, 126]) + length.to_bytes(2, "big")
+        else:
+            header = bytes([0x80 | opcode, 127]) + length.to_bytes(8, "big")
+        self.wfile.write(header + payload)
+
+    def send_exec(self, pod, query):
+        """Runs an exec command over the v4.channel.k8s.io websocket protocol"""
+        command = self.server.jobs.exec_command(pod, query.get("command", [])) if self.server.jobs else None
+        if command is None:
+            return self.send_not_found()
+        accept = base64.b64encode(
+            hashlib.sha1((self.headers["Sec-WebSocket-Key"] + WEBSOCKET_GUID).encode()).digest()
+        ).decode()
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.send_header("Sec-WebSocket-Protocol", "v4.channel.k8s.io")
+        self.end_headers()
+
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        for chunk in iter(lambda: process.stdout.read(64 * 1024), b""):
+            self.send_frame(b"\x01" + chunk)
+        stderr = process.stderr.read()
+        if stderr:
+            self.send_frame(b"\x02" + stderr)
+        if process.wait() == 0:
+            status = {"metadata": {}, "status": "Success"}
+        else:
+            status = {
+                "metadata": {},
+                "status": "Failure",
+                "reason": "NonZeroExitCode",
+                "details": {"causes": [{"reason": "ExitCode", "message": str(process.returncode)}]},
+            }
+        self.send_frame(b"\x03" + json.dumps(status).encode())
+        self.send_frame(b"\x03\xe8", opcode=0x8)
+        self.close_connection = True
+
+    def read_body(self):
+        return json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+    def do_POST(self):
+        parts = urlparse(self.path).path.strip("/").split("/")
+        if len(parts) == 6 and parts[:3] == ["apis", "batch", "v1"] and parts[5] == "jobs" and self.server.jobs:
+            job = self.read_body()
+            self.server.jobs.create(parts[4], job)
+            return self.send_body(job)
+        self.read_body()
+        return self.send_not_found()
+
+    def do_DELETE(self):
+        parts = urlparse(self.path).path.strip("/").split("/")
+        self.read_body()
+        if len(parts) == 7 and parts[:3] == ["apis", "batch", "v1"] and parts[5] == "jobs" and self.server.jobs:
+            if self.server.jobs.delete(parts[6]):
+                return self.send_body({"kind": "Status", "apiVersion": "v1", "status": "Success"})
+        return self.send_not_found()
+
+    def send_not_found(self):
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        settings = self.server.settings
+        if settings.latency:
+            time.sleep(settings.latency)
+
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip("/").split("/")
+
+        if url.path.rstrip("/") == "/version":
+            return self.send_body(
+                {
+                    "major": "1",
+                    "minor": "30",
+                    "gitVersion": "v1.30.5+rke2r1",
+                    "gitCommit": "bench",
+                    "gitTreeState": "clean",
+                    "buildDate": "2026-01-01T00:00:00Z",
+                    "goVersion": "go1.22.7",
+                    "compiler": "gc",
+                    "platform": "linux/amd64",
+                }
+            )
+        if url.path == "/api/v1/namespaces":
+            items = [{"metadata": {"name": ns}} for ns in NAMESPACES]
+            return self.send_body({"kind": "NamespaceList", "apiVersion": "v1", "metadata": {}, "items": items})
+        if url.path == "/api/v1/nodes":
+            names = [NODE_NAME] + [f"bench-node-{i}" for i in range(1, settings.nodes)]
+            items = [{"metadata": {"name": name}} for name in names]
+            return self.send_body({"kind": "NodeList", "apiVersion": "v1", "metadata": {}, "items": items})
+        if url.path == "/api/v1/pods" or (len(parts) == 5 and parts[:2] == ["api", "v1"] and parts[4] == "pods"):
+            return self.send_pod_list(parts[3] if len(parts) == 5 else None, query)
+        if len(parts) == 7 and parts[:2] == ["api", "v1"] and parts[6] == "exec":
+            return self.send_exec(parts[5], query)
+        if len(parts) == 7 and parts[:2] == ["api", "v1"] and parts[6] == "log":
+            return self.send_pod_log(parts[5], query)
+        if url.path.startswith("/apis/metrics.k8s.io/v1beta1/nodes"):
+            # Usage moves with the clock so that sampled metrics have something to summarize
+            now = datetime.now(timezone.utc)
+            items = [
+                {
+                    "metadata": {"name": NODE_NAME},
+                    "timestamp": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "window": "10s",
+                    "usage": {"cpu": f"{250000000 + now.second * 1000000}n", "memory": f"{1048576 + now.second}Ki"},
+                }
+            ]
+            return self.send_body({"kind": "NodeMetricsList", "apiVersion": "metrics.k8s.io/v1beta1", "items": items})
+        if url.path.startswith("/apis/metrics.k8s.io/v1beta1/pods"):
+            now = datetime.now(timezone.utc)
+            pods, _ = self.server.store.items()
+            items = [
+                {
+                    "metadata": {"name": pod["metadata"]["name"], "namespace": pod["metadata"]["namespace"]},
+                    "timestamp": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    "window": "10s",
+                    "containers": [
+                        {"name": c, "usage": {"cpu": f"{1000000 + now.second * 1000}n", "memory": "65536Ki"}}
+                        for c in CONTAINERS
+                    ],
+                }
+                for pod in pods
+            ]
+            return self.send_body({"kind": "PodMetricsList", "apiVersion": "metrics.k8s.io/v1beta1", "items": items})
+        if len(parts) == 6 and parts[:3] == ["apis", "apps", "v1"] and parts[5] == "deployments":
+            items = [
+                {
+                    "metadata": {"name": name, "namespace": parts[4]},
+                    "spec": {
+                        "selector": {},
+                        "template": {
+                            "spec": {"containers": [{"name": f"c{i}", "image": image} for i, image in enumerate(images)]}
+                        },
+                    },
+                }
+                for name, images in DEPLOYMENTS.get(parts[4], [])
+            ]
+            return self.send_body({"kind": "DeploymentList", "apiVersion": "apps/v1", "metadata": {}, "items": items})
+        return self.send_not_found()
+
+    def send_pod_list(self, namespace, query):
+        if query.get("watch", ["false"])[0] == "true":
+            timeout = int(query.get("timeoutSeconds", ["300"])[0])
+            return self.send_chunked(self.watch_events(namespace, timeout), "application/json")
+        selector = query.get("labelSelector", [""])[0]
+        if selector.startswith("job-name="):
+            items = self.server.jobs.pods(selector.split("=", 1)[1]) if self.server.jobs else []
+            return self.send_body({"kind": "PodList", "apiVersion": "v1", "metadata": {}, "items": items})
+        pods, resource_version = self.server.store.items()
+        if namespace:
+            pods = [pod for pod in pods if pod["metadata"]["namespace"] == namespace]
+        limit = int(query.get("limit", ["0"])[0])
+        start = int(query.get("continue", ["0"])[0] or 0)
+        if start and self.server.expire_continue():
+            # Like an API server whose etcd compacted past the token's resource version
+            status = {
+                "kind": "Status",
+                "apiVersion": "v1",
+                "status": "Failure",
+                "message": "The provided continue parameter is too old to display a consistent list result.",
+                "reason": "Expired",
+                "code": 410,
+            }
+            return self.send_body(status, status=410)
+        metadata = {"resourceVersion": resource_version}
+        if limit:
+            if start + limit < len(pods):
+                metadata["continue"] = str(start + limit)
+            pods = pods[start : start + limit]
+        return self.send_body({"kind": "PodList", "apiVersion": "v1", "metadata": metadata, "items": pods})
+
+    def send_pod_log(self, pod, query):
+        settings = self.server.settings
+        lines = settings.log_lines
+        if "tailLines" in query:
+            lines = min(lines, int(query["tailLines"][0]))
+        if "sinceSeconds" in query:
+            lines = min(lines, settings.since_lines)
+        container = query.get("container", [CONTAINERS[0]])[0]
+        timestamps = query.get("timestamps", ["false"])[0] == "true"
+        pod_name = "replica" if settings.shared_logs else pod
+        body = log_body(pod_name, container, lines, settings.line_bytes, timestamps, settings.secret_every)
+        if query.get("follow", ["false"])[0] == "true":
+            return self.send_chunked(self.follow_log(body, pod, container, timestamps), "text/plain")
+        return self.send_body(body, "text/plain")
+
+    def watch_events(self, namespace, timeout):
+        """Yields watch events: the churn of pods in namespace until timeout"""
+        store = self.server.store
+        events = store.watch()
+        deadline = time.time() + timeout
+        try:
+            while time.time() < deadline:
+                try:
+                    event_type, pod = events.get(timeout=min(1.0, max(0.0, deadline - time.time())))
+                except queue.Empty:
+                    continue
+                if namespace and pod["metadata"]["namespace"] != namespace:
+                    continue
+                yield json.dumps({"type": event_type, "object": pod}).encode() + b"\n"
+        finally:
+            store.unwatch(events)
+
+    def follow_log(self, body, pod, container, timestamps):
+        """Yields the log tail, then a new line every follow interval for as long as the pod lives"""
+        settings = self.server.settings
+        yield body
+        seq = 0
+        while settings.follow_interval and self.server.store.is_live(pod):
+            time.sleep(settings.follow_interval)
+            seq += 1
+            prefix = f"{datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f')}000Z " if timestamps else ""
+            yield f'{prefix}level=info pod={pod} container={container} follow={seq} msg="followed line"\n'.encode()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fake Kubernetes API server for Nessie benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--pods", type=int, default=100, help="number of synthetic pods")
+    parser.add_argument("--log-lines", type=int, default=1000, help="lines per container log")
+    parser.add_argument("--line-bytes", type=int, default=120, help="bytes per log line")
+    parser.add_argument("--since-lines", type=int, default=10, help="lines returned for sinceSeconds queries")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every request")
+    parser.add_argument(
+        "--shared-logs", action="store_true", help="serve identical logs for every pod, like replicas of one workload"
+    )
+    parser.add_argument(
+        "--secret-every", type=int, default=0, help="put a password in every Nth log line, for redaction benchmarks"
+    )
+    parser.add_argument(
+        "--follow-interval", type=float, default=1.0, help="seconds between new lines on followed logs (0 ends them)"
+    )
+    parser.add_argument(
+        "--churn-interval", type=float, default=0.0, help="replace the oldest pod with a new one this often, in seconds"
+    )
+    parser.add_argument(
+        "--expire-continue", type=int, default=0, help="answer the first N continued pod listings with 410 Gone"
+    )
+    parser.add_argument("--nodes", type=int, default=1, help="number of nodes in the node list")
+    parser.add_argument(
+        "--nessie", help="path to nessie.py; created Jobs then run it locally as a node agent, as in coordinator mode"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    settings = parse_args(argv)
+    settings.latency = settings.latency_ms / 1000
+    server = ThreadingHTTPServer((settings.host, settings.port), FakeApiHandler)
+    server.daemon_threads = True
+    server.settings = settings
+    server.store = PodStore(settings.pods)
+    server.jobs = JobRunner(settings.nessie, tempfile.mkdtemp(prefix="nessie-jobs-")) if settings.nessie else None
+    expired = itertools.count()
+    server.expire_continue = lambda: next(expired) < settings.expire_continue
+    if settings.churn_interval:
+        def churn():
+            while True:
+                time.sleep(settings.churn_interval)
+                server.store.churn()
+
+        threading.Thread(target=churn, daemon=True).start()
+    print(f"Serving {settings.pods} pods on http://{settings.host}:{settings.port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
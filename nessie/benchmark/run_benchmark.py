@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# Benchmark driver for Nessie: runs nessie.main() against the fake API server
+# for a range of cluster sizes and reports wall time, peak RSS and archive throughput
+
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+NESSIE_DIR = BENCHMARK_DIR.parent
+DEFAULT_SIZES = "10,100,1000,10000"
+
+# Runs Nessie in a child process so that peak RSS is measured for that run alone
+RUNNER = """
+import sys
+sys.path.insert(0, sys.argv[1])
+import nessie
+nessie.HOST_LOG_PATHS = {"libvirt-qemu": sys.argv[2]}
+sys.exit(nessie.main())
+"""
+
+KUBECONFIG = """apiVersion: v1
+kind: Config
+clusters:
+- name: bench
+  cluster:
+    server: http://127.0.0.1:{port}
+users:
+- name: bench
+  user:
+    token: bench
+contexts:
+- name: bench
+  context:
+    cluster: bench
+    user: bench
+current-context: bench
+"""
+
+PROMETHEUS_SAMPLE = re.compile(r'^(\w+)(?:\{phase="(\w+)"\})? (\S+)$')
+
+
+def free_port():
+    """Returns a TCP port that is currently free on localhost"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, process, timeout=30):
+    """Waits until the fake API server accepts connections"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Fake API server exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Fake API server did not start listening on port {port}")
+
+
+def create_host_files(host_dir, count, size_mb):
+    """Creates synthetic VM logs to stand in for HOST_LOG_PATHS"""
+    host_dir.mkdir(parents=True, exist_ok=True)
+    line = b"2026-01-01 00:00:00.000+0000: starting up libvirt version: 10.0.0, qemu version: 8.2.0\n"
+    block = line * (1024 * 1024 // len(line))
+    for i in range(count):
+        with open(host_dir / f"vm{i}.log", "wb") as f:
+            for _ in range(size_mb):
+                f.write(block)
+
+
+def read_prometheus_textfile(path):
+    """Returns per-phase and run-level metrics from Nessie's Prometheus textfile"""
+    phases = {}
+    totals = {}
+    for line in Path(path).read_text().splitlines():
+        match = PROMETHEUS_SAMPLE.match(line)
+        if not match:
+            continue
+        name, phase, value = match.groups()
+        if phase:
+            phases.setdefault(name, {})[phase] = float(value)
+        else:
+            totals[name] = float(value)
+    return phases, totals
+
+
+def run_size(pods, args, workdir, host_dir):
+    """Runs one collection against a fake cluster of the given size and returns its measurements"""
+    run_dir = workdir / f"pods-{pods}"
+    shutil.rmtree(run_dir, ignore_errors=True)
+    run_dir.mkdir(parents=True)
+
+    port = free_port()
+    kubeconfig = run_dir / "kubeconfig"
+    kubeconfig.write_text(KUBECONFIG.format(port=port))
+    prometheus_file = run_dir / "nessie.prom"
+
+    server_cmd = [
+        sys.executable,
+        str(BENCHMARK_DIR / "fake_apiserver.py"),
+        "--port", str(port),
+        "--pods", str(pods),
+        "--log-lines", str(args.log_lines),
+        "--line-bytes", str(args.line_bytes),
+        "--latency-ms", str(args.latency_ms),
+    ]
+    if args.shared_logs:
+        server_cmd.append("--shared-logs")
+    if args.secret_every:
+        server_cmd += ["--secret-every", str(args.secret_every)]
+    if args.expire_continue:
+        server_cmd += ["--expire-continue", str(args.expire_continue)]
+    server = subprocess.Popen(server_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port, server)
+
+        env = dict(os.environ)
+        env.update(
+            {
+                "PATH": f"{BENCHMARK_DIR / 'bin'}{os.pathsep}{env.get('PATH', '')}",
+                "KUBECONFIG": str(kubeconfig),
+                "NESSIE_LOG_DIR": str(run_dir / "logs"),
+                "NESSIE_PROMETHEUS_TEXTFILE": str(prometheus_file),
+                "NESSIE_BENCH_JOURNAL_LINES": str(args.journal_lines),
+            }
+        )
+        env.update(args.env)
+
+        start = time.time()
+        with open(run_dir / "nessie.log", "wb") as log:
+            nessie = subprocess.Popen(
+                [sys.executable, "-c", RUNNER, str(NESSIE_DIR), str(host_dir)], env=env, stdout=log, stderr=log
+            )
+            _, status, usage = os.wait4(nessie.pid, 0)
+            nessie.returncode = os.waitstatus_to_exitcode(status)
+        wall_time = time.time() - start
+    finally:
+        server.terminate()
+        server.wait()
+
+    result = {
+        "pods": pods,
+        "exit_code": nessie.returncode,
+        "wall_seconds": round(wall_time, 2),
+        "peak_rss_mb": round(usage.ru_maxrss / 1024, 1),
+        "bad_pod_logs": count_bad_pod_logs(run_dir / "logs"),
+    }
+    if prometheus_file.exists():
+        phases, totals = read_prometheus_textfile(prometheus_file)
+        collected = sum(phases.get("nessie_phase_bytes", {}).values())
+        archive_seconds = phases.get("nessie_phase_duration_seconds", {}).get("archive", 0.0)
+        result.update(
+            {
+                "collected_mb": round(collected / 1024 / 1024, 1),
+                "archive_mb": round(totals.get("nessie_archive_bytes", 0) / 1024 / 1024, 1),
+                "archive_seconds": round(archive_seconds, 2),
+                "archive_mb_per_second": round(collected / 1024 / 1024 / archive_seconds, 1) if archive_seconds else None,
+                "phase_seconds": phases.get("nessie_phase_duration_seconds", {}),
+            }
+        )
+    return result
+
+
+def count_bad_pod_logs(log_dir):
+    """Counts collected pod logs holding a placeholder instead of the container's log"""
+    bad = 0
+    for path in log_dir.glob("nessie_logs_*/pods/*/*.log"):
+        # A log whose fetch never completed used to be written out as the text "None"
+        if path.stat().st_size <= 4 and path.read_bytes() == b"None":
+            bad += 1
+    return bad
+
+
+def print_report(results):
+    """Prints the benchmark results as a table"""
+    columns = [
+        ("pods", "Pods"),
+        ("exit_code", "Exit"),
+        ("wall_seconds", "Wall (s)"),
+        ("peak_rss_mb", "Peak RSS (MB)"),
+        ("bad_pod_logs", "Bad logs"),
+        ("collected_mb", "Collected (MB)"),
+        ("archive_mb", "Archive (MB)"),
+        ("archive_seconds", "Archive (s)"),
+        ("archive_mb_per_second", "Archive (MB/s)"),
+    ]
+    rows = [[str(result.get(key, "-")) for key, _ in columns] for result in results]
+    widths = [max(len(header), *(len(row[i]) for row in rows)) for i, (_, header) in enumerate(columns)]
+    print("  ".join(header.rjust(width) for (_, header), width in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(value.rjust(width) for value, width in zip(row, widths)))
+
+
+def parse_env(value):
+    if "=" not in value:
+        raise argparse.ArgumentTypeError(f"expected KEY=VALUE, got '{value}'")
+    return tuple(value.split("=", 1))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Nessie against a fake Kubernetes API server")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated pod counts (default {DEFAULT_SIZES})")
+    parser.add_argument("--log-lines", type=int, default=1000, help="lines per container log")
+    parser.add_argument("--line-bytes", type=int, default=120, help="bytes per log line")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every API request")
+    parser.add_argument("--shared-logs", action="store_true", help="serve identical logs for every pod")
+    parser.add_argument("--secret-every", type=int, default=0, help="put a password in every Nth log line")
+    parser.add_argument(
+        "--expire-continue", type=int, default=0, help="fail the first N continued pod listings with 410 Gone"
+    )
+    parser.add_argument("--journal-lines", type=int, default=1000, help="lines printed by the journalctl stub")
+    parser.add_argument("--host-files", type=int, default=3, help="number of synthetic host log files")
+    parser.add_argument("--host-file-mb", type=int, default=1, help="size of each synthetic host log file")
+    parser.add_argument(
+        "--env", type=parse_env, action="append", default=[], metavar="KEY=VALUE",
+        help="extra environment for Nessie, e.g. --env NESSIE_STREAM_LOGS=true (repeatable)",
+    )
+    parser.add_argument("--workdir", help="directory for benchmark output (default: a temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="keep the collected data and archives")
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+    args.sizes = [int(size) for size in args.sizes.split(",") if size]
+    args.env = dict(args.env)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix="nessie-bench-"))
+    workdir.mkdir(parents=True, exist_ok=True)
+    host_dir = workdir / "host-logs"
+    create_host_files(host_dir, args.host_files, args.host_file_mb)
+
+    results = []
+    try:
+        for pods in args.sizes:
+            print(f"Running Nessie against {pods} pods...", file=sys.stderr, flush=True)
+            results.append(run_size(pods, args, workdir, host_dir))
+            if not args.keep:
+                shutil.rmtree(workdir / f"pods-{pods}" / "logs", ignore_errors=True)
+    finally:
+        if not args.keep and not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2) + "\n")
+    return 0 if all(result["exit_code"] == 0 and not result["bad_pod_logs"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,22 +3,84 @@
 # Collects logs and configurations from SUSE Kubernetes environments
 
 import os
+import errno
+import gzip
+import hashlib
+import heapq
+import io
+import json
 import yaml
 import time
 import logging
+import mmap
+import multiprocessing
+import shlex
 import shutil
+import signal
 import tarfile
+import tempfile
+import queue
+import re
+import threading
 import subprocess
+import struct
+import sys
+import zlib
+from array import array
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
 from datetime import datetime, timedelta
-from kubernetes import client, config
-from pathlib import Path
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from kubernetes import client, config, watch
+from kubernetes.stream import stream as exec_stream
+from kubernetes.utils import parse_quantity
+from pathlib import Path, PurePosixPath
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def env_integers(name):
+    """Parses a "key=number,..." environment variable into a dict"""
+    return {
+        key.strip(): int(value)
+        for key, _, value in (item.partition("=") for item in os.environ.get(name, "").split(","))
+        if key.strip() and value.strip()
+    }
+
 
 # Configuration from environment variables with defaults
 LOG_DIR = os.environ.get("NESSIE_LOG_DIR", "/tmp")
 ZIP_DIR = os.environ.get("NESSIE_ZIP_DIR", f"{LOG_DIR}/archives")
 MAX_LOG_SIZE = int(os.environ.get("NESSIE_MAX_LOG_SIZE", "1024")) * 1024 * 1024
 RETENTION_DAYS = int(os.environ.get("NESSIE_RETENTION_DAYS", "30"))
+ARCHIVE_QUOTA = int(os.environ.get("NESSIE_ARCHIVE_QUOTA", "0")) * 1024 * 1024
+CATALOG_FILE = Path(ZIP_DIR) / "nessie_catalog.yaml"
+# Collections started within the same second get a counter suffix, at most this many per second
+COLLECTION_NAME_ATTEMPTS = 100
 MAX_POD_LOG_LINES = int(os.environ.get("NESSIE_MAX_POD_LOG_LINES", "1000"))
+POD_LOG_WORKERS = max(1, int(os.environ.get("NESSIE_POD_LOG_WORKERS", "8")))
+POD_LIST_PAGE_SIZE = max(1, int(os.environ.get("NESSIE_POD_LIST_PAGE_SIZE", "100")))
+# A listing whose continue token expired (410 Gone) starts over from the first page, at most this often
+POD_LIST_RESTARTS = 3
+
+# Concurrency cap and timeouts for shelled-out commands (journalctl, helm, kubectl)
+COMMAND_WORKERS = max(1, int(os.environ.get("NESSIE_COMMAND_WORKERS", "4")))
+COMMAND_TIMEOUT = int(os.environ.get("NESSIE_COMMAND_TIMEOUT", "60"))
+COMMAND_TIMEOUTS = env_integers("NESSIE_COMMAND_TIMEOUTS")
+
+# Weighted shares of NESSIE_MAX_LOG_SIZE per source class ("name=weight,...", 0 disables a class's limit)
+LOG_SIZE_WEIGHTS = {"pod_logs": 4, "node_logs": 3, "host_file_logs": 2, "k8s_configs": 1}
+LOG_SIZE_WEIGHTS.update(env_integers("NESSIE_LOG_SIZE_WEIGHTS"))
+TRUNCATION_REPORT_LIMIT = 100
+
+# Tail mode for HOST_LOG_PATHS entries ("name=limit,..."): only the last lines and/or bytes of each file
+HOST_LOG_TAIL_LINES = env_integers("NESSIE_HOST_LOG_TAIL_LINES")
+HOST_LOG_TAIL_BYTES = env_integers("NESSIE_HOST_LOG_TAIL_BYTES")
 
 # Namespace filtering
 NAMESPACES_FILTER = os.environ.get("NESSIE_NAMESPACES", "").split(",") if os.environ.get("NESSIE_NAMESPACES") else None
@@ -34,11 +96,216 @@ SKIP_METRICS = os.environ.get("NESSIE_SKIP_METRICS", "").lower() in ("true", "ye
 SKIP_VERSIONS = os.environ.get("NESSIE_SKIP_VERSIONS", "").lower() in ("true", "yes", "1", "on")
 SKIP_HOST_FILE_LOGS = os.environ.get("NESSIE_SKIP_HOST_FILE_LOGS", "").lower() in ("true", "yes", "1", "on")
 
+# Collection phases run concurrently up to this many at a time (1 runs them in sequence)
+COLLECTOR_WORKERS = max(1, int(os.environ.get("NESSIE_COLLECTOR_WORKERS", "6")))
+
+# Streaming collection writes logs straight to disk instead of buffering them in memory
+STREAM_LOGS = os.environ.get("NESSIE_STREAM_LOGS", "").lower() in ("true", "yes", "1", "on")
+STREAM_CHUNK_SIZE = 64 * 1024
+KERNEL_COPY_CHUNK_SIZE = 64 * 1024 * 1024
+
+# Single-pass archiving appends each file to the archive as soon as it is written
+SINGLE_PASS_ARCHIVE = os.environ.get("NESSIE_SINGLE_PASS_ARCHIVE", "").lower() in ("true", "yes", "1", "on")
+SKIP_RAW_DIR = os.environ.get("NESSIE_SKIP_RAW_DIR", "").lower() in ("true", "yes", "1", "on")
+ARCHIVE_SPOOL_SIZE = 8 * 1024 * 1024
+
+# Content-addressed deduplication: files with identical content are stored once and linked
+DEDUP = os.environ.get("NESSIE_DEDUP", "").lower() in ("true", "yes", "1", "on")
+DEDUP_MIN_SIZE = 1024
+
+# Secret redaction in the write path: lines are only matched against the rules whose literals they contain
+REDACT = os.environ.get("NESSIE_REDACT", "").lower() in ("true", "yes", "1", "on")
+REDACT_WORKERS = max(0, int(os.environ.get("NESSIE_REDACT_WORKERS", str(os.cpu_count() or 1))))
+REDACT_BLOCK_SIZE = 1024 * 1024
+REDACT_PIPELINE_DEPTH = 2
+REDACT_SOURCES = ("pod_logs", "node_logs", "host_file_logs", "k8s_configs")
+REDACTED = b"[REDACTED]"
+# Each rule is (name, lowercase literals that must appear in a line, pattern); group 1 is kept
+REDACTION_RULES = [
+    ("bearer_token", (b"bearer",), re.compile(rb"(?i)(\bbearer[ \t]+)[A-Za-z0-9._~+/-]{8,}=*")),
+    (
+        "basic_auth",
+        (b"basic",),
+        re.compile(rb"(?i)(\bauthorization[\"']?[ \t]*[:=][ \t]*[\"']?basic[ \t]+)[A-Za-z0-9+/]{8,}=*"),
+    ),
+    ("jwt", (b"eyj",), re.compile(rb"()\beyJ[A-Za-z0-9_-]{8,}\.eyJ[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]*")),
+    (
+        "credential",
+        (b"passw", b"secret", b"token", b"key"),
+        re.compile(
+            rb"(?i)((?:passw(?:or)?d|secret|token|api[_-]?key|access[_-]?key)[\"']?[ \t]*[:=][ \t]*[\"']?)"
+            rb"(?!\[REDACTED\])[^\s\"',;&}\]]+"
+        ),
+    ),
+    ("kubeconfig_key", (b"key",), re.compile(rb"(?i)(client-key-data[\"']?[ \t]*:[ \t]*[\"']?)[A-Za-z0-9+/=]{16,}")),
+    (
+        "url_credentials",
+        (b"://",),
+        re.compile(rb"(\b[a-zA-Z][a-zA-Z0-9+.-]*://[^/\s:@\"']+:)(?!\[REDACTED\])[^/\s@\"']+(?=@)"),
+    ),
+    ("aws_access_key", (b"akia",), re.compile(rb"()\bAKIA[0-9A-Z]{16}\b")),
+]
+REDACTION_LITERALS = sorted({literal for _, literals, _ in REDACTION_RULES for literal in literals})
+PRIVATE_KEY_PATTERN = re.compile(
+    rb"(-----BEGIN [A-Z ]*PRIVATE KEY-----)(.*?)(-----END [A-Z ]*PRIVATE KEY-----|\Z)", re.DOTALL
+)
+PRIVATE_KEY_END_PATTERN = re.compile(rb"-----END [A-Z ]*PRIVATE KEY-----")
+
+# Error-signature index of collected logs, shipped as index/errors.json
+ERROR_INDEX = os.environ.get("NESSIE_ERROR_INDEX", "").lower() in ("true", "yes", "1", "on")
+ERROR_INDEX_FILE = "index/errors.json"
+ERROR_INDEX_SOURCES = ("pod_logs", "node_logs", "host_file_logs", "k8s_configs")
+ERROR_INDEX_MAX_POSTINGS = 1000
+ERROR_INDEX_REPORT_LIMIT = 100
+ERROR_INDEX_MAX_LINE = 1024 * 1024
+# Each signature is (name, lowercase literals of which a line must hold one, pattern the line must also match)
+ERROR_SIGNATURES = [
+    ("oom_killed", (b"oom", b"out of memory"), re.compile(rb"(?i)oom[-_ ]?kill|out of memory")),
+    ("panic", (b"panic",), re.compile(rb"\bpanic(?::|\()|(?i:kernel panic)")),
+    ("crash_loop", (b"crashloop", b"back-off restarting"), None),
+    ("image_pull", (b"imagepull",), None),
+    ("segfault", (b"segfault", b"segmentation fault"), None),
+    ("traceback", (b"traceback (most recent call last)",), None),
+    ("evicted", (b"evicted",), None),
+    ("disk_full", (b"no space left on device",), None),
+    ("connection_refused", (b"connection refused",), None),
+    ("timeout", (b"deadline exceeded", b"i/o timeout", b"timed out"), None),
+    ("certificate", (b"x509:",), None),
+    ("permission_denied", (b"permission denied",), None),
+    (
+        "fatal",
+        (b"fatal", b"crit"),
+        re.compile(
+            rb"(?i)\b(?:level|lvl|severity)[\"']?[ \t]*[=:][ \t]*[\"']?(?:fatal|crit(?:ical)?)\b"
+            rb"|\[(?:fatal|crit(?:ical)?)\]|\bfatal:|(?-i:\b(?:FATAL|CRITICAL)\b)"
+        ),
+    ),
+    (
+        "error",
+        (b"error",),
+        re.compile(
+            rb"(?i)\b(?:level|lvl|severity)[\"']?[ \t]*[=:][ \t]*[\"']?err(?:or)?\b|\[error\]|\berror:|(?-i:\bERROR\b)"
+        ),
+    ),
+]
+ERROR_SIGNATURE_LITERALS = sorted({literal for _, literals, _ in ERROR_SIGNATURES for literal in literals})
+
+# Timestamp-ordered merge of every collected log, shipped as timeline.log
+TIMELINE = os.environ.get("NESSIE_TIMELINE", "").lower() in ("true", "yes", "1", "on")
+TIMELINE_FILE = "timeline.log"
+TIMELINE_SOURCES = ("pod_logs", "node_logs", "host_file_logs")
+TIMELINE_MERGE_FANIN = 256
+# Lines are keyed by their timestamp, normalized to a fixed-width RFC 3339 UTC form with nanoseconds
+TIMELINE_KEY_WIDTH = len("2026-01-01T00:00:00.000000000Z")
+TIMELINE_TIMESTAMP = re.compile(
+    rb"(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})(?:[.,](\d{1,9})\d*)? ?(Z|[+-]\d{2}:?\d{2})?(?=[\s:\]])"
+)
+
+# Metrics sampling polls metrics.k8s.io several times instead of taking one snapshot, storing
+# each node's (and optionally pod's) samples as columns of timestamps, CPU and memory
+METRICS_SAMPLES = max(1, int(os.environ.get("NESSIE_METRICS_SAMPLES", "1")))
+METRICS_INTERVAL = max(1.0, float(os.environ.get("NESSIE_METRICS_INTERVAL", "15")))
+METRICS_PODS = os.environ.get("NESSIE_METRICS_PODS", "").lower() in ("true", "yes", "1", "on")
+
+# Incremental collection resumes from per-container and per-journal high-water marks
+INCREMENTAL = os.environ.get("NESSIE_INCREMENTAL", "").lower() in ("true", "yes", "1", "on")
+STATE_FILE = Path(LOG_DIR) / "nessie_state.yaml"
+
+# Journal format: text (one journalctl per source) or json/export (one journalctl for all units,
+# split per unit), limited to an optional --since/--until window shared by every journal query
+JOURNAL_MODE = os.environ.get("NESSIE_JOURNAL_MODE", "text").lower()
+JOURNAL_SINCE = os.environ.get("NESSIE_JOURNAL_SINCE", "")
+JOURNAL_UNTIL = os.environ.get("NESSIE_JOURNAL_UNTIL", "")
+JOURNAL_EXTENSIONS = {"text": ".log", "json": ".json", "export": ".export"}
+JOURNAL_CURSOR_PREFIX = "-- cursor: "
+
+# Daemon mode follows pod logs into per-container ring buffers and snapshots them on request
+DAEMON = os.environ.get("NESSIE_DAEMON", "").lower() in ("true", "yes", "1", "on")
+DAEMON_BUFFER_LINES = max(1, int(os.environ.get("NESSIE_DAEMON_BUFFER_LINES", str(MAX_POD_LOG_LINES))))
+DAEMON_MAX_STREAMS = max(1, int(os.environ.get("NESSIE_DAEMON_MAX_STREAMS", "1000")))
+DAEMON_DELETED_POD_TTL = int(os.environ.get("NESSIE_DAEMON_DELETED_POD_TTL", "3600"))
+DAEMON_PORT = int(os.environ.get("NESSIE_DAEMON_PORT", "0"))
+DAEMON_WATCH_TIMEOUT = 300
+DAEMON_RETRY_DELAY = 2
+DAEMON_MAX_RETRY_DELAY = 30
+DAEMON_SIGNAL_POLL = 0.5
+
+# Coordinator mode runs node-level collection on every node as a Job and merges the results
+COORDINATOR = os.environ.get("NESSIE_COORDINATOR", "").lower() in ("true", "yes", "1", "on")
+COORDINATOR_IMAGE = os.environ.get("NESSIE_COORDINATOR_IMAGE", "ghcr.io/gagrio/nessie:latest")
+COORDINATOR_NAMESPACE = os.environ.get("NESSIE_COORDINATOR_NAMESPACE", "")
+COORDINATOR_WORKERS = max(1, int(os.environ.get("NESSIE_COORDINATOR_WORKERS", "4")))
+NODE_TIMEOUT = int(os.environ.get("NESSIE_NODE_TIMEOUT", "600"))
+NODE_SELECTOR = os.environ.get("NESSIE_NODE_SELECTOR", "")
+NODE_AGENT = os.environ.get("NESSIE_NODE_AGENT", "").lower() in ("true", "yes", "1", "on")
+NODE_AGENT_LOG_DIR = "/tmp/nessie-node"
+NODE_AGENT_READY_FILE = "archive_ready"
+NODE_AGENT_POLL_INTERVAL = 2
+SERVICE_ACCOUNT_NAMESPACE_FILE = "/var/run/secrets/kubernetes.io/serviceaccount/namespace"
+JOURNAL_HOST_PATHS = ["/var/log/journal", "/run/log/journal", "/etc/machine-id"]
+# Node agents only collect node logs, archiving them straight to gzip for the coordinator to merge
+NODE_AGENT_ENV = {
+    "NESSIE_NODE_AGENT": "true",
+    "NESSIE_LOG_DIR": NODE_AGENT_LOG_DIR,
+    "NESSIE_SKIP_POD_LOGS": "true",
+    "NESSIE_SKIP_K8S_CONFIGS": "true",
+    "NESSIE_SKIP_METRICS": "true",
+    "NESSIE_SKIP_VERSIONS": "true",
+    "NESSIE_SINGLE_PASS_ARCHIVE": "true",
+    "NESSIE_SKIP_RAW_DIR": "true",
+    "NESSIE_COMPRESSION": "gzip",
+    "NESSIE_DEDUP": "false",
+    "NESSIE_ERROR_INDEX": "false",
+    "NESSIE_TIMELINE": "false",
+}
+NODE_AGENT_EXCLUDED_ENV = (
+    "NESSIE_COORDINATOR",
+    "NESSIE_DAEMON",
+    "NESSIE_NODE_",
+    "NESSIE_ZIP_DIR",
+    "NESSIE_INCREMENTAL",
+    "NESSIE_PROMETHEUS_TEXTFILE",
+)
+
+# Archive compression backend: gzip (single-threaded), pgzip (parallel block gzip), indexed
+# (parallel block gzip with an embedded member index for `nessie extract`) or zstd
+COMPRESSION = os.environ.get("NESSIE_COMPRESSION", "gzip").lower()
+COMPRESSION_THREADS = max(1, int(os.environ.get("NESSIE_COMPRESSION_THREADS", str(os.cpu_count() or 1))))
+ZSTD_LEVEL = int(os.environ.get("NESSIE_ZSTD_LEVEL", "3"))
+PARALLEL_GZIP_LEVEL = 6
+PARALLEL_GZIP_BLOCK_SIZE = 1024 * 1024
+ARCHIVE_EXTENSIONS = {"gzip": ".tar.gz", "pgzip": ".tar.gz", "indexed": ".tar.gz", "zstd": ".tar.zst"}
+ARCHIVE_INDEX_NAME = "archive_index.json"
+ARCHIVE_INDEX_TRAILER_ID = b"NX"
+ARCHIVE_INDEX_TRAILER_FIELDS = struct.Struct("<4Q")
+EXTRACT_CHUNK_SIZE = 64 * 1024
+
+# Performance telemetry: slowest calls listed per phase, optional Prometheus textfile output
+TELEMETRY_SLOWEST = 5
+PROMETHEUS_TEXTFILE = os.environ.get("NESSIE_PROMETHEUS_TEXTFILE", "")
+
 # Configure logging
 log_level = max(logging.WARNING - (VERBOSE * 10), logging.DEBUG)
 logging.basicConfig(level=log_level, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+if COMPRESSION not in ARCHIVE_EXTENSIONS:
+    logger.warning(f"Unknown NESSIE_COMPRESSION '{COMPRESSION}', falling back to gzip")
+    COMPRESSION = "gzip"
+elif COMPRESSION == "zstd" and zstandard is None:
+    logger.warning("NESSIE_COMPRESSION=zstd requires the zstandard Python package, falling back to gzip")
+    COMPRESSION = "gzip"
+ARCHIVE_EXTENSION = ARCHIVE_EXTENSIONS[COMPRESSION]
+
+if JOURNAL_MODE not in JOURNAL_EXTENSIONS:
+    logger.warning(f"Unknown NESSIE_JOURNAL_MODE '{JOURNAL_MODE}', falling back to text")
+    JOURNAL_MODE = "text"
+JOURNAL_EXTENSION = JOURNAL_EXTENSIONS[JOURNAL_MODE]
+
+for source in [name for name in LOG_SIZE_WEIGHTS if name not in ("pod_logs", "node_logs", "host_file_logs", "k8s_configs")]:
+    logger.warning(f"Ignoring NESSIE_LOG_SIZE_WEIGHTS entry for unknown source '{source}'")
+    del LOG_SIZE_WEIGHTS[source]
+
 # Service logs to collect
 NODE_SERVICES = {
     "system": "journalctl -n 1000 --no-pager",
@@ -47,7 +314,22 @@ NODE_SERVICES = {
     "nmc": "journalctl -u nm-configurator --no-pager",
 }
 
-# Commands to retrieve version information
+# Units behind each journal source, collected with a single journalctl in the json/export modes.
+# Sources without units here (the system journal) get their own call with their NODE_SERVICES arguments.
+JOURNAL_UNITS = {
+    "combustion": ["combustion"],
+    "hauler": ["hauler"],
+    "nmc": ["nm-configurator"],
+    "metal3": ["ironic", "metal3"],
+    "ptp4l": ["ptp4l"],
+    "phc2sys": ["phc2sys"],
+}
+# Sources that keep only their last entries, like the -n 1000 of their text-mode commands
+JOURNAL_UNIT_LINES = {"metal3": 1000, "ptp4l": 1000, "phc2sys": 1000}
+JOURNAL_UNIT_FIELDS = (b"_SYSTEMD_UNIT", b"UNIT", b"OBJECT_SYSTEMD_UNIT")
+JSON_JOURNAL_FIELD = re.compile(rb'"(__CURSOR|_SYSTEMD_UNIT|UNIT|OBJECT_SYSTEMD_UNIT)"\s*:\s*"([^"]*)"')
+
+# Commands to retrieve version information (the kubectl ones are a fallback for the API lookups below)
 VERSION_COMMANDS = {
     "helm": "helm version --short",
     "kubectl": "kubectl version",
@@ -59,6 +341,17 @@ VERSION_COMMANDS = {
     "cdi": "kubectl get deployment cdi-operator -n cdi -o jsonpath='{.spec.template.spec.containers[0].image}'",
 }
 
+# Deployments whose container images identify component versions, resolved through the API:
+# component -> (namespace, deployment, whether to report every container image)
+DEPLOYMENT_VERSIONS = {
+    "upgrade-controller": ("cattle-system", "system-upgrade-controller", False),
+    "endpoint-copier-operator": ("endpoint-copier-operator", "endpoint-copier-operator", False),
+    "metallb": ("metallb-system", "metallb-controller", True),
+    "sriov-network-operator": ("sriov-network-operator", "sriov-network-operator", False),
+    "kubevirt": ("kubevirt", "virt-operator", False),
+    "cdi": ("cdi", "cdi-operator", False),
+}
+
 # Host filesystem log paths to collect
 HOST_LOG_PATHS = {
     "libvirt-qemu": "/var/log/libvirt/qemu",
@@ -75,10 +368,14 @@ class ProgressTracker:
         self.start_time = time.time()
         logger.info(f"Starting {operation_name} (0/{total_items})")
 
+    def add_items(self, count):
+        """Grows the total when items are discovered incrementally"""
+        self.total += count
+
     def update(self, increment=1):
         """Updates progress counter and logs status"""
         self.current += increment
-        percent = (self.current / self.total) * 100
+        percent = (self.current / self.total) * 100 if self.total else 100.0
         elapsed = time.time() - self.start_time
         logger.info(
             f"{self.operation_name} progress: {self.current}/{self.total} ({percent:.1f}%) - {elapsed:.1f}s elapsed"
@@ -91,6 +388,90 @@ class ProgressTracker:
         return total_time
 
 
+def percentile(sorted_values, fraction):
+    """Returns the nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(len(sorted_values) * fraction + 0.999999))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class PerformanceTelemetry:
+    """Records per-phase wall time and API/subprocess call latencies
+
+    Thread-safe, so collectors can record from their worker threads. Bytes and file
+    counts are not tracked here; they are derived from what the CollectionWriter wrote.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clears all recorded data before a new collection run"""
+        with self._lock:
+            self.phase_times = {}
+            self.calls = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Times a collection phase"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phase_times[name] = self.phase_times.get(name, 0.0) + time.time() - start
+
+    def record_call(self, phase, label, seconds):
+        """Records the latency of a single API request or subprocess"""
+        with self._lock:
+            self.calls.setdefault(phase, []).append((seconds, label))
+
+    @contextmanager
+    def timed_call(self, phase, label):
+        """Times a single API request or subprocess"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record_call(phase, label, time.time() - start)
+
+    def report(self, source_totals=None):
+        """Returns per-phase wall time, bytes, file counts and call latency statistics
+
+        source_totals maps each source to the files and bytes written for it, as kept
+        by CollectionWriter.
+        """
+        phases = {}
+        with self._lock:
+            phase_times = dict(self.phase_times)
+            calls = {phase: list(samples) for phase, samples in self.calls.items()}
+
+        for name in list(phase_times) + [name for name in calls if name not in phase_times]:
+            phases[name] = {"wall_seconds": round(phase_times.get(name, 0.0), 3), "bytes": 0, "files": 0}
+        for source, totals in (source_totals or {}).items():
+            entry = phases.setdefault(source, {"wall_seconds": 0.0, "bytes": 0, "files": 0})
+            entry["bytes"] += totals["bytes"]
+            entry["files"] += totals["files"]
+
+        for name, samples in calls.items():
+            latencies = sorted(seconds for seconds, _ in samples)
+            slowest = sorted(samples, key=lambda sample: sample[0], reverse=True)[:TELEMETRY_SLOWEST]
+            phases[name]["calls"] = len(samples)
+            phases[name]["call_latency_seconds"] = {
+                "p50": round(percentile(latencies, 0.50), 3),
+                "p95": round(percentile(latencies, 0.95), 3),
+                "max": round(latencies[-1], 3),
+            }
+            phases[name]["slowest_calls"] = [{"name": label, "seconds": round(seconds, 3)} for seconds, label in slowest]
+
+        return phases
+
+
+telemetry = PerformanceTelemetry()
+
+
 def ensure_directories():
     """Creates required directories and verifies write access"""
     try:
@@ -148,42 +529,1449 @@ def setup_kubernetes_client():
             logger.error("Failed to find or load any Kubernetes configuration")
             return None, None
 
-    return client.CoreV1Api(), client.CustomObjectsApi()
+    # Size the connection pool so every pod log worker and pod listing can hold its own connection,
+    # alongside the API calls of the collectors running at the same time: one direct call per
+    # running phase, plus the run_parallel tasks, which share COMMAND_WORKERS slots process-wide
+    configuration = client.Configuration.get_default_copy()
+    configuration.connection_pool_maxsize = (
+        POD_LOG_WORKERS + len(NAMESPACES_FILTER or [None]) + COMMAND_WORKERS + COLLECTOR_WORKERS
+    )
+    if COORDINATOR:
+        # Each node collection in flight polls its Job and streams the archive out of the agent pod
+        configuration.connection_pool_maxsize += COORDINATOR_WORKERS
+    if DAEMON:
+        # Every followed log stream and pod watch holds a connection for as long as it is open
+        configuration.connection_pool_maxsize += DAEMON_MAX_STREAMS + len(NAMESPACES_FILTER or [None])
+    api_client = client.ApiClient(configuration)
+
+    return client.CoreV1Api(api_client), client.CustomObjectsApi(api_client)
+
 
+def command_timeout(name):
+    """Returns the timeout for a named command, honouring NESSIE_COMMAND_TIMEOUTS overrides"""
+    return COMMAND_TIMEOUTS.get(name, COMMAND_TIMEOUT)
 
-def run_command(command, shell=False):
+
+def run_command(command, shell=False, timeout=None):
     """Runs a command safely and returns its output"""
+    timeout = timeout or COMMAND_TIMEOUT
     try:
         args = command if isinstance(command, list) else command
         result = subprocess.run(
-            args, shell=shell, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=60
+            args, shell=shell, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=timeout
         )
         if result.returncode == 0:
             return True, result.stdout
         else:
             return False, f"Command failed with code {result.returncode}: {result.stderr}"
     except subprocess.TimeoutExpired:
-        return False, "Command timed out after 60 seconds"
+        return False, f"Command timed out after {timeout} seconds"
     except Exception as e:
         return False, f"Error executing command: {e}"
 
 
-def collect_node_logs():
-    """Collects logs from system services on the host node"""
+# Collectors run at the same time share these slots, so COMMAND_WORKERS caps commands process-wide
+command_slots = threading.BoundedSemaphore(COMMAND_WORKERS)
+
+
+def run_timed(phase, name, task):
+    """Runs task in a command slot, recording its latency against phase when one is given"""
+    with command_slots:
+        if phase is None:
+            return task()
+        with telemetry.timed_call(phase, name):
+            return task()
+
+
+def run_parallel(tasks, on_complete=None, phase=None):
+    """Runs independent (success, output) tasks concurrently, capped at COMMAND_WORKERS
+
+    The cap is shared with every other run_parallel call in progress. tasks maps a name
+    to a zero-argument callable. Results are returned keyed by name in the original
+    order, and on_complete is called from this thread as each finishes. When phase is
+    given, each task's latency is recorded under it.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=COMMAND_WORKERS) as executor:
+        futures = {executor.submit(run_timed, phase, name, task): name for name, task in tasks.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                results[name] = (False, f"Error executing command: {e}")
+            if on_complete:
+                on_complete()
+    return {name: results[name] for name in tasks}
+
+
+def write_chunks(path, chunks):
+    """Writes an iterable of byte chunks to path and returns the number of bytes written"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    written = 0
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def read_file_range(src, length):
+    """Yields up to length bytes from the current position of the open file src"""
+    while length > 0:
+        chunk = src.read(min(STREAM_CHUNK_SIZE, length))
+        if not chunk:
+            return
+        length -= len(chunk)
+        yield chunk
+
+
+def copy_file_contents(src, destination, offset=0, length=None, sinks=()):
+    """Copies length bytes (default: up to EOF) from offset in the open file src to destination
+
+    The data is moved inside the kernel with copy_file_range, or sendfile where that is
+    not supported (e.g. across filesystems on older kernels). A chunked copy is the last
+    resort. Each method resumes from the file offsets where the previous one stopped.
+    With sinks, objects with an update method that must see the data, only the chunked
+    copy is used. Returns the number of bytes copied.
+    """
+    destination = Path(destination)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    copied = 0
+
+    def remaining():
+        return KERNEL_COPY_CHUNK_SIZE if length is None else min(KERNEL_COPY_CHUNK_SIZE, length - copied)
+
+    src.seek(offset)
+    with open(destination, "wb") as dst:
+        src_fd, dst_fd = src.fileno(), dst.fileno()
+        kernel_copies = []
+        if hasattr(os, "copy_file_range") and not sinks:
+            kernel_copies.append(("copy_file_range", lambda: os.copy_file_range(src_fd, dst_fd, remaining())))
+        if hasattr(os, "sendfile") and not sinks:
+            kernel_copies.append(("sendfile", lambda: os.sendfile(dst_fd, src_fd, None, remaining())))
+
+        for name, kernel_copy in kernel_copies:
+            try:
+                while remaining():
+                    count = kernel_copy()
+                    if not count:
+                        break
+                    copied += count
+                return copied
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM):
+                    raise
+                logger.debug(f"{name} not supported for {src.name}: {e}")
+
+        while remaining():
+            chunk = src.read(min(STREAM_CHUNK_SIZE, remaining()))
+            if not chunk:
+                break
+            dst.write(chunk)
+            for sink in sinks:
+                sink.update(chunk)
+            copied += len(chunk)
+        return copied
+
+
+def hash_chunks(chunks, digest):
+    """Passes chunks through unchanged while feeding them to digest"""
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+class ParallelGzipWriter:
+    """Write-only file object that gzip-compresses fixed-size blocks on a thread pool
+
+    Each block becomes an independent gzip member. Concatenated members form a valid
+    gzip stream, so the result is still a standard .tar.gz readable by tar and gunzip.
+    """
+
+    def __init__(self, fileobj, threads):
+        self.fileobj = fileobj
+        self._buffer = bytearray()
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+        self._pending = deque()
+        self._max_pending = threads * 2
+
+    def _submit(self, block):
+        self._pending.append(self._executor.submit(gzip.compress, block, PARALLEL_GZIP_LEVEL, mtime=0))
+        # Bound memory by writing out finished blocks in order once enough are in flight
+        while len(self._pending) > self._max_pending:
+            self.fileobj.write(self._pending.popleft().result())
+
+    def write(self, data):
+        self._buffer.extend(data)
+        while len(self._buffer) >= PARALLEL_GZIP_BLOCK_SIZE:
+            self._submit(bytes(self._buffer[:PARALLEL_GZIP_BLOCK_SIZE]))
+            del self._buffer[:PARALLEL_GZIP_BLOCK_SIZE]
+        return len(data)
+
+    def close(self):
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        while self._pending:
+            self.fileobj.write(self._pending.popleft().result())
+        self._executor.shutdown()
+        self.fileobj.close()
+
+
+class IndexedGzipWriter(ParallelGzipWriter):
+    """ParallelGzipWriter that remembers where each block's gzip member starts
+
+    Blocks all hold PARALLEL_GZIP_BLOCK_SIZE uncompressed bytes, so the block holding any
+    offset of the uncompressed stream, and the compressed offset to start reading it
+    from, can be looked up without decompressing what comes before.
+    """
+
+    def __init__(self, fileobj, threads):
+        super().__init__(fileobj, threads)
+        self.received = 0
+        self.frames = [0]
+
+    def _submit(self, block):
+        self._pending.append(self._executor.submit(gzip.compress, block, PARALLEL_GZIP_LEVEL, mtime=0))
+        while len(self._pending) > self._max_pending:
+            self._write_frame(self._pending.popleft().result())
+
+    def _write_frame(self, frame):
+        self.fileobj.write(frame)
+        self.frames.append(self.frames[-1] + len(frame))
+
+    def write(self, data):
+        self.received += len(data)
+        return super().write(data)
+
+    def tell(self):
+        return self.received
+
+    def drain(self):
+        """Writes out every full block submitted so far, fixing the offsets of their members"""
+        while self._pending:
+            self._write_frame(self._pending.popleft().result())
+
+    def close(self, trailer=None):
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer.clear()
+        self.drain()
+        self._executor.shutdown()
+        if trailer:
+            self.fileobj.write(trailer(self.frames))
+        self.fileobj.close()
+
+
+class IndexedTarFile(tarfile.TarFile):
+    """TarFile that records the uncompressed offset and size of every member it writes"""
+
+    def __init__(self, *args, **kwargs):
+        self.index = {}
+        self.links = {}
+        super().__init__(*args, **kwargs)
+
+    def addfile(self, tarinfo, fileobj=None):
+        super().addfile(tarinfo, fileobj)
+        if tarinfo.islnk():
+            self.links[tarinfo.name] = tarinfo.linkname
+        elif tarinfo.isreg():
+            # Member data is padded to whole blocks and ends where the archive now stands
+            padded = -(-tarinfo.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+            self.index[tarinfo.name] = (self.offset - padded, tarinfo.size)
+
+
+def archive_index_trailer(frame_offset, frame_start, index_offset, index_size):
+    """Returns an empty gzip member whose extra field locates the archive's member index
+
+    The member sits at the very end of the archive at a fixed size, so readers find it
+    with one seek. Decompressors treat it as a member holding no data.
+    """
+    payload = ARCHIVE_INDEX_TRAILER_FIELDS.pack(frame_offset, frame_start, index_offset, index_size)
+    extra = ARCHIVE_INDEX_TRAILER_ID + struct.pack("<H", len(payload)) + payload
+    empty = zlib.compressobj(wbits=-15)
+    deflated = empty.compress(b"") + empty.flush()
+    return b"\x1f\x8b\x08\x04" + bytes(4) + b"\x00\xff" + struct.pack("<H", len(extra)) + extra + deflated + bytes(8)
+
+
+ARCHIVE_INDEX_TRAILER_SIZE = len(archive_index_trailer(0, 0, 0, 0))
+
+
+class ArchiveStream:
+    """A tar archive written through the configured compression backend"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._compressor = None
+        if COMPRESSION == "gzip":
+            self.tar = tarfile.open(self.path, "w:gz")
+            return
+
+        fileobj = open(self.path, "wb")
+        if COMPRESSION == "zstd":
+            compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=COMPRESSION_THREADS)
+            self._compressor = compressor.stream_writer(fileobj)
+        elif COMPRESSION == "indexed":
+            # Not a stream: every byte the tar writes must reach the writer before it is indexed
+            self._compressor = IndexedGzipWriter(fileobj, COMPRESSION_THREADS)
+            self.tar = IndexedTarFile(fileobj=self._compressor, mode="w")
+            return
+        else:
+            self._compressor = ParallelGzipWriter(fileobj, COMPRESSION_THREADS)
+        self.tar = tarfile.open(fileobj=self._compressor, mode="w|")
+
+    def _add_index(self):
+        """Appends the member index to the archive and returns a builder for the trailer locating it"""
+        self._compressor.drain()
+        root = next(iter(self.tar.index), ARCHIVE_INDEX_NAME).split("/")[0]
+        index = {
+            "version": 1,
+            "root": root,
+            "frame_size": PARALLEL_GZIP_BLOCK_SIZE,
+            "frames": self._compressor.frames,
+            "members": self.tar.index,
+            "links": self.tar.links,
+        }
+        data = json.dumps(index, separators=(",", ":")).encode()
+        info = tarfile.TarInfo(f"{root}/{ARCHIVE_INDEX_NAME}")
+        info.size = len(data)
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        self.tar.addfile(info, io.BytesIO(data))
+        offset, size = self.tar.index[info.name]
+        frame = offset // PARALLEL_GZIP_BLOCK_SIZE
+        return lambda frames: archive_index_trailer(
+            frames[frame], frame * PARALLEL_GZIP_BLOCK_SIZE, offset, size
+        )
+
+    def close(self):
+        if isinstance(self._compressor, IndexedGzipWriter):
+            trailer = self._add_index()
+            self.tar.close()
+            self._compressor.close(trailer)
+            return
+        self.tar.close()
+        if self._compressor:
+            self._compressor.close()
+
+
+def file_source(relpath):
+    """Maps a path inside the collection directory to the collector that produced it"""
+    parts = PurePosixPath(relpath).parts
+    if parts[0] == "node":
+        # In coordinator mode each node's files sit in a node/<node name>/ directory
+        depth = 3 if COORDINATOR else 2
+        return "host_file_logs" if len(parts) > depth else "node_logs"
+    return {
+        "pods": "pod_logs",
+        "configs": "k8s_configs",
+        "metrics": "node_metrics",
+        "versions": "versions",
+    }.get(parts[0], "summary")
+
+
+def tail_offset(path, lines=None, max_bytes=None):
+    """Returns the offset at which the last lines and/or max_bytes of a file begin
+
+    Lines are found by scanning a memory map backwards for newlines, so only the pages
+    holding the tail are read and the cost depends on the tail size, not the file size.
+    A byte limit that cuts through a line moves the offset to the start of the next one.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        floor = size - max_bytes if max_bytes and size > max_bytes else 0
+        if not lines or not size:
+            return line_aligned_offset(lambda at, length: os.pread(f.fileno(), length, at), floor)
+
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            # A trailing newline ends the last line rather than starting a new one
+            end = size - 1 if mm[size - 1] == ord("\n") else size
+            for _ in range(lines):
+                newline = mm.rfind(b"\n", floor, end)
+                if newline < 0:
+                    return line_aligned_offset(lambda at, length: mm[at : at + length], floor)
+                end = newline
+            return end + 1
+
+
+def line_aligned_offset(read_at, offset, limit=STREAM_CHUNK_SIZE):
+    """Moves offset past the next newline so a tail starts on a whole line
+
+    read_at(offset, size) returns the bytes at offset. The offset is left alone if no
+    newline is found within limit bytes.
+    """
+    if offset == 0:
+        return 0
+    newline = read_at(offset - 1, limit).find(b"\n")
+    return offset + newline if newline >= 0 else offset
+
+
+class ByteBudget:
+    """Enforces NESSIE_MAX_LOG_SIZE as weighted per-source shares of one byte budget
+
+    Content whose size is known up front keeps its newest tail; streams are written until
+    their share is spent and the remainder is drained and dropped. Sources without a weight
+    (metrics, versions and the summary itself) are not limited.
+    """
+
+    def __init__(self, total, weights):
+        weight_sum = sum(weight for weight in weights.values() if weight > 0)
+        self.total = total
+        self.shares = {source: total * weight // weight_sum for source, weight in weights.items() if weight > 0}
+        self.used = dict.fromkeys(self.shares, 0)
+        self.truncations = []
+        self.truncated = set()
+        self.truncation_counts = dict.fromkeys(self.shares, 0)
+        self.skipped = dict.fromkeys(self.shares, 0)
+        self._lock = threading.Lock()
+
+    def grant(self, source, size):
+        """Reserves up to size bytes of source's share and returns how many were granted"""
+        if source not in self.shares:
+            return size
+        with self._lock:
+            granted = max(0, min(size, self.shares[source] - self.used[source]))
+            self.used[source] += granted
+        return granted
+
+    def release(self, source, size):
+        """Returns unused bytes to source's share"""
+        if source in self.shares and size:
+            with self._lock:
+                self.used[source] -= size
+
+    def exhausted(self, source):
+        """Whether source has no bytes left to write"""
+        return source in self.shares and self.used[source] >= self.shares[source]
+
+    def record_skip(self, source):
+        """Counts an item that was not collected at all because source's share was spent"""
+        with self._lock:
+            self.skipped[source] += 1
+
+    def record_truncation(self, relpath, kept, dropped, kept_part):
+        source = file_source(relpath)
+        with self._lock:
+            self.truncations.append(
+                {"file": relpath, "kept_bytes": kept, "dropped_bytes": dropped, "kept": kept_part}
+            )
+            self.truncated.add(relpath)
+            self.truncation_counts[source] += 1
+            first = self.truncation_counts[source] == 1
+        if first:
+            logger.warning(f"Log size budget for {source} is spent, truncating {relpath} and any further {source} files")
+        logger.debug(f"Kept {kept_part} {kept} bytes of {relpath}, dropped {dropped} bytes")
+
+    def tail_range(self, relpath, size, read_at):
+        """Returns the (offset, length) of the part of a size-byte file that fits the budget"""
+        source = file_source(relpath)
+        granted = self.grant(source, size)
+        if granted == size:
+            return 0, size
+        offset = line_aligned_offset(read_at, size - granted) if granted else size
+        self.release(source, offset - (size - granted))
+        self.record_truncation(relpath, size - offset, offset, "tail")
+        return offset, size - offset
+
+    def limit(self, relpath, chunks):
+        """Applies relpath's share to a list of chunks (keeping the tail) or a stream (keeping the head)"""
+        if isinstance(chunks, (list, tuple)):
+            data = b"".join(chunks)
+            offset, _ = self.tail_range(relpath, len(data), lambda start, size: data[start : start + size])
+            yield data[offset:]
+            return
+
+        source = file_source(relpath)
+        kept = dropped = 0
+        for chunk in chunks:
+            granted = self.grant(source, len(chunk)) if not dropped else 0
+            if granted:
+                yield chunk[:granted] if granted < len(chunk) else chunk
+            kept += granted
+            dropped += len(chunk) - granted
+        if dropped:
+            self.record_truncation(relpath, kept, dropped, "head")
+
+    def report(self):
+        """Returns per-source shares and usage plus the truncated files for the summary report"""
+        with self._lock:
+            truncations = list(self.truncations)
+            sources = {
+                source: {
+                    "share_bytes": share,
+                    "used_bytes": self.used[source],
+                    "truncated_files": self.truncation_counts[source],
+                    "skipped_items": self.skipped[source],
+                }
+                for source, share in self.shares.items()
+            }
+        return {
+            "max_bytes": self.total,
+            "sources": sources,
+            "truncated_files": truncations[:TRUNCATION_REPORT_LIMIT],
+            "truncated_files_total": len(truncations),
+        }
+
+
+class FixedSizeReader:
+    """Reads exactly size bytes from a file that may shrink while it is being archived
+
+    Log rotation with copytruncate can empty a file mid-copy; the missing bytes are
+    zero-filled so the tar stream stays consistent with the size already in its header.
+    What is read is fed to sinks, objects with an update method such as hashes.
+    """
+
+    def __init__(self, fileobj, size, *sinks):
+        self.fileobj = fileobj
+        self.remaining = size
+        self.sinks = sinks
+
+    def read(self, size=-1):
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.fileobj.read(size)
+        if len(data) < size:
+            data += b"\0" * (size - len(data))
+        self.remaining -= size
+        for sink in self.sinks:
+            sink.update(data)
+        return data
+
+
+def line_blocks(chunks, size):
+    """Regroups byte chunks into blocks of at least size bytes that end at a line break"""
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= size:
+            cut = buffer.rfind(b"\n") + 1 or len(buffer)
+            yield bytes(buffer[:cut])
+            del buffer[:cut]
+    if buffer:
+        yield bytes(buffer)
+
+
+def literal_lines(lowered, literals):
+    """Returns the (start, end) offsets of the lines of a lowercased block that hold any of literals, in order
+
+    Each literal costs one pass over the block in C, so the lines worth a closer look
+    are found without running a pattern over every line.
+    """
+    lines = set()
+    for literal in literals:
+        at = lowered.find(literal)
+        while at >= 0:
+            end = lowered.find(b"\n", at) + 1 or len(lowered)
+            lines.add((lowered.rfind(b"\n", 0, at) + 1, end))
+            at = lowered.find(literal, end)
+    return sorted(lines)
+
+
+def redact_private_keys(block, in_private_key):
+    """Replaces the bodies of PEM private keys, which span lines, and returns the count and whether one is left open"""
+    count = 0
+    if in_private_key:
+        end = PRIVATE_KEY_END_PATTERN.search(block)
+        if not end:
+            return REDACTED + b"\n", 0, True
+        block = REDACTED + b"\n" + block[end.start() :]
+
+    def replace(match):
+        nonlocal count, in_private_key
+        begin, body, end = match.groups()
+        in_private_key = not end
+        separator = b"\n" if b"\n" in body else b""
+        if body.strip() != REDACTED:
+            count += 1
+        return begin + separator + REDACTED + separator + end
+
+    in_private_key = False
+    block = PRIVATE_KEY_PATTERN.sub(replace, block)
+    return block, count, in_private_key
+
+
+def redact_block(block, in_private_key=False):
+    """Redacts secrets in a block of whole lines
+
+    The block is first searched for the rules' literals; each rule's pattern then only
+    runs on the lines that hold one of its literals. Returns the redacted block, the
+    redactions per rule and whether the block ends inside a private key.
+    """
+    counts = {}
+    lowered = block.lower()
+    if in_private_key or b"private key-----" in lowered:
+        block, count, in_private_key = redact_private_keys(block, in_private_key)
+        if count:
+            counts["private_key"] = count
+        lowered = block.lower()
+
+    lines = literal_lines(lowered, REDACTION_LITERALS)
+    if not lines:
+        return block, counts, in_private_key
+
+    parts = []
+    position = 0
+    for start, end in lines:
+        line, lowered_line = block[start:end], lowered[start:end]
+        for name, literals, pattern in REDACTION_RULES:
+            if any(literal in lowered_line for literal in literals):
+                line, count = pattern.subn(rb"\1" + REDACTED, line)
+                if count:
+                    counts[name] = counts.get(name, 0) + count
+        parts += [block[position:start], line]
+        position = end
+    parts.append(block[position:])
+    return b"".join(parts), counts, in_private_key
+
+
+class Redactor:
+    """Redacts secrets from collected files, spreading blocks of lines over worker processes
+
+    Blocks are redacted on the assumption that they do not start inside a private key;
+    the rare block that does is redone once the block before it turns out to end in one.
+    """
+
+    def __init__(self, workers):
+        self._executor = None
+        if workers > 1:
+            # Workers are forked from a clean server process, not from this threaded one
+            self._executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("forkserver"))
+        self._lock = threading.Lock()
+        self.files = {}
+
+    def redact(self, relpath, chunks):
+        """Yields chunks with secrets redacted, recording the redactions made in relpath"""
+        counts = {}
+        in_private_key = False
+        pending = deque()
+
+        def finish():
+            nonlocal in_private_key
+            block, future = pending.popleft()
+            if future and not in_private_key:
+                block, block_counts, in_private_key = future.result()
+            else:
+                block, block_counts, in_private_key = redact_block(block, in_private_key)
+            for name, count in block_counts.items():
+                counts[name] = counts.get(name, 0) + count
+            return block
+
+        for block in line_blocks(chunks, REDACT_BLOCK_SIZE):
+            pending.append((block, self._executor.submit(redact_block, block) if self._executor else None))
+            if len(pending) > REDACT_PIPELINE_DEPTH:
+                yield finish()
+        while pending:
+            yield finish()
+
+        with self._lock:
+            if counts:
+                self.files[relpath] = counts
+            else:
+                self.files.pop(relpath, None)
+
+    def report(self):
+        """Returns the redactions per rule and per file for the summary report"""
+        with self._lock:
+            files = {relpath: dict(counts) for relpath, counts in sorted(self.files.items())}
+        rules = {}
+        for counts in files.values():
+            for name, count in counts.items():
+                rules[name] = rules.get(name, 0) + count
+        return {"total": sum(rules.values()), "rules": rules, "files": files}
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown()
+
+
+class ErrorScanner:
+    """Finds error signatures in one file as its bytes are written, keeping track of line numbers
+
+    Data is fed through update, like a hash; close adds the file's hits to the index.
+    """
+
+    def __init__(self, index, relpath):
+        self.index = index
+        self.relpath = relpath
+        self.line = 1
+        self.pending = b""
+        self.postings = {}
+        self.counts = {}
+
+    def update(self, data):
+        data = self.pending + data
+        cut = data.rfind(b"\n") + 1
+        if not cut and len(data) < ERROR_INDEX_MAX_LINE:
+            self.pending = data
+            return
+        self._scan(data[:cut] if cut else data)
+        self.pending = data[cut:] if cut else b""
+
+    def _scan(self, block):
+        """Records the signatures found in a block of whole lines"""
+        lowered = block.lower()
+        line, position = self.line, 0
+        for start, end in literal_lines(lowered, ERROR_SIGNATURE_LITERALS):
+            line += lowered.count(b"\n", position, start)
+            position = start
+            text, lowered_text = block[start:end], lowered[start:end]
+            for name, literals, pattern in ERROR_SIGNATURES:
+                if any(literal in lowered_text for literal in literals) and (not pattern or pattern.search(text)):
+                    self.counts[name] = self.counts.get(name, 0) + 1
+                    postings = self.postings.setdefault(name, [])
+                    if len(postings) < ERROR_INDEX_MAX_POSTINGS:
+                        postings.append(line)
+        self.line = line + lowered.count(b"\n", position)
+
+    def close(self):
+        if self.pending:
+            self._scan(self.pending)
+            self.pending = b""
+        self.index.add(self.relpath, self.postings, self.counts)
+
+
+class ErrorIndex:
+    """Inverted index from error signatures to the lines of collected files that show them
+
+    Postings are line numbers, at most ERROR_INDEX_MAX_POSTINGS per signature and file;
+    the hit counts are always complete.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.postings = {}
+        self.counts = {}
+
+    def scanner(self, relpath):
+        return ErrorScanner(self, relpath)
+
+    def add(self, relpath, postings, counts):
+        with self._lock:
+            if counts:
+                self.postings[relpath] = postings
+                self.counts[relpath] = counts
+            else:
+                self.postings.pop(relpath, None)
+                self.counts.pop(relpath, None)
+
+    def totals(self):
+        totals = {}
+        for counts in self.counts.values():
+            for name, count in counts.items():
+                totals[name] = totals.get(name, 0) + count
+        return totals
+
+    def to_json(self):
+        """Returns the index as compact JSON: postings by signature and file, and hit counts by file"""
+        with self._lock:
+            signatures = {}
+            for relpath, postings in sorted(self.postings.items()):
+                for name, lines in postings.items():
+                    signatures.setdefault(name, {})[relpath] = lines
+            index = {
+                "version": 1,
+                "max_postings": ERROR_INDEX_MAX_POSTINGS,
+                "totals": self.totals(),
+                "signatures": signatures,
+                "files": dict(sorted(self.counts.items())),
+            }
+        return json.dumps(index, separators=(",", ":"))
+
+    def report(self):
+        """Returns hit totals and the files with the most hits for the summary report"""
+        with self._lock:
+            hottest = sorted(self.counts.items(), key=lambda item: (-sum(item[1].values()), item[0]))
+            return {
+                "index_file": ERROR_INDEX_FILE,
+                "totals": self.totals(),
+                "files": dict(hottest[:ERROR_INDEX_REPORT_LIMIT]),
+                "files_total": len(hottest),
+            }
+
+
+def timeline_timestamp(match):
+    """Returns the fixed-width UTC form of a TIMELINE_TIMESTAMP match
+
+    Timestamps without an offset are taken to be in UTC already.
+    """
+    date, clock, fraction, offset = match.groups()
+    stamp = b"%sT%s" % (date, clock)
+    offset = offset.replace(b":", b"") if offset else b"Z"
+    if offset not in (b"Z", b"+0000", b"-0000"):
+        shift = timedelta(hours=int(offset[1:3]), minutes=int(offset[3:5]))
+        local = datetime.fromisoformat(stamp.decode())
+        stamp = (local - shift if offset[:1] == b"+" else local + shift).strftime("%Y-%m-%dT%H:%M:%S").encode()
+    return b"%s.%sZ" % (stamp, (fraction or b"").ljust(9, b"0"))
+
+
+def journal_timestamp(microseconds):
+    """Returns the fixed-width UTC form of a journal __REALTIME_TIMESTAMP"""
+    seconds, microseconds = divmod(int(microseconds), 1000000)
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)).encode() + b".%06d000Z" % microseconds
+
+
+def timeline_text_entries(f):
+    """Yields (timestamp, message) for each line of a log whose lines start with a timestamp
+
+    Lines without one, such as the rest of a stack trace, carry the timestamp of the line
+    before them. Lines before the first timestamp are left out.
+    """
+    timestamp = None
+    for line in f:
+        match = TIMELINE_TIMESTAMP.match(line)
+        if match:
+            timestamp = timeline_timestamp(match)
+            line = line[match.end() :].lstrip(b" :")
+        if timestamp:
+            yield timestamp, line
+
+
+def timeline_json_entries(f):
+    """Yields (timestamp, message) for each entry of a journalctl -o json file"""
+    for line in f:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if "__REALTIME_TIMESTAMP" in entry:
+            # Messages that are not valid UTF-8 are exported as arrays of bytes
+            message = entry.get("MESSAGE") or ""
+            message = bytes(message) if isinstance(message, list) else str(message).encode()
+            yield journal_timestamp(entry["__REALTIME_TIMESTAMP"]), message
+
+
+def timeline_export_entries(f):
+    """Yields (timestamp, message) for each entry of a journalctl -o export file"""
+    for _, fields in journal_export_entries(f, keep=(b"__REALTIME_TIMESTAMP", b"MESSAGE")):
+        if b"__REALTIME_TIMESTAMP" in fields:
+            yield journal_timestamp(fields[b"__REALTIME_TIMESTAMP"]), fields.get(b"MESSAGE", b"")
+
+
+TIMELINE_PARSERS = {".json": timeline_json_entries, ".export": timeline_export_entries}
+
+
+def timeline_lines(path, origin):
+    """Yields the timeline lines of one collected file, each prefixed with its timestamp and origin"""
+    parse = TIMELINE_PARSERS.get(Path(path).suffix, timeline_text_entries)
+    with open(path, "rb") as f:
+        for timestamp, message in parse(f):
+            for line in message.rstrip(b"\r\n").split(b"\n"):
+                yield b"%s %s: %s\n" % (timestamp, origin, line)
+
+
+def read_lines(path):
+    """Yields the lines of a file"""
+    with open(path, "rb") as f:
+        yield from f
+
+
+def merge_timeline(sources):
+    """Merges iterables of timeline lines, each in time order, into one
+
+    Lines with the same timestamp keep the order of their sources, so the lines that
+    inherited a timestamp stay right after the line they belong to.
+    """
+    return heapq.merge(*sources, key=lambda line: line[:TIMELINE_KEY_WIDTH])
+
+
+def build_timeline(writer):
+    """Yields timeline.log in blocks: a k-way merge of the collected logs already written to disk
+
+    Only the next line of each file is held in memory. Beyond TIMELINE_MERGE_FANIN files,
+    groups of them are first merged into temporary runs, so that no more files than that
+    are open at once.
+    """
+    journals = {journal_relpath(name) for name in JOURNAL_UNITS}
+    sources = [
+        partial(timeline_lines, writer.path(relpath), str(PurePosixPath(relpath).with_suffix("")).encode())
+        for relpath, (_, _, source, _) in sorted(writer.manifest.items())
+        if source in TIMELINE_SOURCES or relpath in journals
+    ]
+    logger.info(f"Merging {len(sources)} logs into {TIMELINE_FILE}")
+    with tempfile.TemporaryDirectory(dir=LOG_DIR) as run_dir:
+        level = 0
+        while len(sources) > TIMELINE_MERGE_FANIN:
+            runs = []
+            for start in range(0, len(sources), TIMELINE_MERGE_FANIN):
+                run = Path(run_dir) / f"{level}-{len(runs)}"
+                group = sources[start : start + TIMELINE_MERGE_FANIN]
+                write_chunks(run, line_blocks(merge_timeline(source() for source in group), STREAM_CHUNK_SIZE))
+                runs.append(partial(read_lines, run))
+            sources, level = runs, level + 1
+        yield from line_blocks(merge_timeline(source() for source in sources), STREAM_CHUNK_SIZE)
+
+
+class CollectionWriter:
+    """Writes collected files into the collection directory and, in single-pass mode, into the archive
+
+    Every file is written exactly once. When an archive path is given, each file is appended
+    to the archive as soon as it is complete; with keep_raw disabled the file only passes
+    through a spooled buffer and never lands in the collection directory.
+
+    Each file is hashed with SHA-256 while it is written and recorded in the manifest,
+    along with per-source file and byte totals. Host files copied in the kernel never pass
+    through Python and are recorded without a checksum. With a redactor, collected logs and
+    configs have secrets redacted before anything else sees them; with an error index,
+    they are scanned for error signatures as they are written.
+    """
+
+    def __init__(
+        self, collection_dir, archive_path=None, keep_raw=True, budget=None, dedup=False, redactor=None, error_index=None
+    ):
+        self.collection_dir = Path(collection_dir)
+        self.budget = budget
+        self.dedup = dedup
+        self.redactor = redactor
+        self.error_index = error_index
+        self.archive_path = Path(archive_path) if archive_path else None
+        self.keep_raw = keep_raw or self.archive_path is None
+        self.manifest = {}
+        self.source_totals = {}
+        self.blobs = {}
+        self.duplicates = {}
+        self._lock = threading.Lock()
+        self._tar = None
+        if self.archive_path:
+            self._partial_path = self.archive_path.with_name(self.archive_path.name + ".part")
+            self._archive = ArchiveStream(self._partial_path)
+            self._tar = self._archive.tar
+
+    def path(self, relpath):
+        """Returns the location of relpath inside the collection directory"""
+        return self.collection_dir / relpath
+
+    def _arcname(self, relpath):
+        return f"{self.collection_dir.name}/{relpath}"
+
+    def _scanners(self, relpath):
+        """Returns the error scanner for relpath in a tuple, or an empty one if it is not indexed"""
+        if self.error_index and file_source(relpath) in ERROR_INDEX_SOURCES:
+            return (self.error_index.scanner(relpath),)
+        return ()
+
+    def _record(self, relpath, size, digest):
+        """Adds a written file to the manifest and the source totals, digest being None if it was not hashed"""
+        source = file_source(relpath)
+        truncated = bool(self.budget) and relpath in self.budget.truncated
+        with self._lock:
+            previous = self.manifest.get(relpath)
+            if previous:
+                self.source_totals[previous[2]]["files"] -= 1
+                self.source_totals[previous[2]]["bytes"] -= previous[1]
+            self.manifest[relpath] = (digest.hexdigest() if digest else "-", size, source, truncated)
+            totals = self.source_totals.setdefault(source, {"files": 0, "bytes": 0})
+            totals["files"] += 1
+            totals["bytes"] += size
+
+    def _find_original(self, relpath, digest, size):
+        """Returns the earlier file with the same content, or registers relpath as the first one
+
+        Must be called with the lock held, so the first copy is archived before any link to it.
+        """
+        if digest is None or size < DEDUP_MIN_SIZE:
+            return None
+        key = digest.hexdigest()
+        original = self.blobs.get(key)
+        if original is None:
+            self.blobs[key] = relpath
+        else:
+            self.duplicates[relpath] = original
+        return original
+
+    def _add_link(self, relpath, original):
+        """Adds relpath to the archive as a hard link to the already archived original"""
+        info = tarfile.TarInfo(self._arcname(relpath))
+        info.type = tarfile.LNKTYPE
+        info.linkname = self._arcname(original)
+        info.mtime = int(time.time())
+        info.mode = 0o644
+        self._tar.addfile(info)
+
+    def write(self, relpath, chunks, limit=True):
+        """Writes byte chunks to relpath, discarding partial output if the chunk source fails
+
+        Content is hashed as it is written. With deduplication, a file identical to an
+        earlier one becomes a hard link to it, on disk and in the archive. limit=False
+        is for content whose size the byte budget has already granted.
+        """
+        path = self.path(relpath)
+        if self.redactor and file_source(relpath) in REDACT_SOURCES:
+            redacted = self.redactor.redact(relpath, chunks)
+            # A list stays a list so the budget still keeps its tail
+            chunks = [b"".join(redacted)] if isinstance(chunks, (list, tuple)) else redacted
+        if self.budget and limit:
+            chunks = self.budget.limit(relpath, chunks)
+        digest = hashlib.sha256()
+        chunks = hash_chunks(chunks, digest)
+        scanners = self._scanners(relpath)
+        for scanner in scanners:
+            chunks = hash_chunks(chunks, scanner)
+        dedup_digest = digest if self.dedup else None
+
+        if self.keep_raw:
+            try:
+                size = write_chunks(path, chunks)
+            except Exception:
+                if path.exists():
+                    path.unlink()
+                raise
+            with self._lock:
+                original = self._find_original(relpath, dedup_digest, size)
+                if self._tar:
+                    if original:
+                        self._add_link(relpath, original)
+                    else:
+                        self._tar.add(path, arcname=self._arcname(relpath))
+            if original:
+                link = path.with_name(path.name + ".link")
+                os.link(self.path(original), link)
+                os.replace(link, path)
+        else:
+            with tempfile.SpooledTemporaryFile(max_size=ARCHIVE_SPOOL_SIZE, dir=LOG_DIR) as spool:
+                for chunk in chunks:
+                    spool.write(chunk)
+                info = tarfile.TarInfo(self._arcname(relpath))
+                info.size = size = spool.tell()
+                info.mtime = int(time.time())
+                info.mode = 0o644
+                spool.seek(0)
+                with self._lock:
+                    original = self._find_original(relpath, dedup_digest, size)
+                    if original:
+                        self._add_link(relpath, original)
+                    else:
+                        self._tar.addfile(info, spool)
+
+        # Duplicates take no extra space, so they do not count against the byte budget
+        if original and self.budget:
+            self.budget.release(file_source(relpath), size)
+
+        for scanner in scanners:
+            scanner.close()
+        self._record(relpath, size, digest)
+        return path
+
+    def dedup_report(self):
+        """Returns the duplicate files and the bytes they would have taken up"""
+        return {
+            "algorithm": "sha256",
+            "unique_files": len(self.blobs),
+            "duplicate_files": len(self.duplicates),
+            "bytes_saved": sum(self.manifest[relpath][1] for relpath in self.duplicates if relpath in self.manifest),
+        }
+
+    def manifest_lines(self):
+        """Yields the manifest as tab-separated lines of SHA-256, size, source, truncation flag and path
+
+        Files copied in the kernel have no checksum, shown as "-".
+        """
+        with self._lock:
+            entries = sorted(self.manifest.items())
+        yield b"# sha256\tsize\tsource\ttruncated\tpath\n"
+        for relpath, (digest, size, source, truncated) in entries:
+            yield f"{digest}\t{size}\t{source}\t{'yes' if truncated else 'no'}\t{relpath}\n".encode()
+
+    def write_text(self, relpath, text):
+        """Writes a string to relpath"""
+        return self.write(relpath, [str(text).encode(errors="replace")])
+
+    def copy_file(self, relpath, source, start=0):
+        """Copies an existing file from offset start to relpath without passing its contents through Python
+
+        Without a raw directory the file is added to the archive straight from its source.
+        """
+        path = self.path(relpath)
+        with open(source, "rb") as src:
+            start = min(start, os.fstat(src.fileno()).st_size)
+            offset, length = start, os.fstat(src.fileno()).st_size - start
+            if self.budget:
+                offset, length = self.budget.tail_range(
+                    relpath, length, lambda at, size: os.pread(src.fileno(), size, start + at)
+                )
+                offset += start
+            if self.redactor and file_source(relpath) in REDACT_SOURCES:
+                # Redaction needs the contents, so the copy goes through Python after all
+                src.seek(offset)
+                return self.write(relpath, read_file_range(src, length), limit=False)
+            scanners = self._scanners(relpath)
+            if self.keep_raw:
+                # Only when the error index has to see the contents anyway are they copied
+                # through Python and checksummed; a kernel copy is recorded without a checksum
+                digest = hashlib.sha256() if scanners else None
+                try:
+                    size = copy_file_contents(src, path, offset, length, (digest, *scanners) if scanners else ())
+                except Exception:
+                    if path.exists():
+                        path.unlink()
+                    raise
+                if self._tar:
+                    with self._lock:
+                        self._tar.add(path, arcname=self._arcname(relpath))
+            else:
+                info = self._tar.gettarinfo(arcname=self._arcname(relpath), fileobj=src)
+                info.size = size = length
+                src.seek(offset)
+                digest = hashlib.sha256()
+                with self._lock:
+                    self._tar.addfile(info, FixedSizeReader(src, size, digest, *scanners))
+
+        for scanner in scanners:
+            scanner.close()
+        self._record(relpath, size, digest)
+        return path
+
+    def close(self):
+        """Finalizes the single-pass archive and returns its path"""
+        if not self._tar:
+            return None
+        self._archive.close()
+        os.replace(self._partial_path, self.archive_path)
+        logger.info(f"Archive created at {self.archive_path}")
+        return str(self.archive_path)
+
+    def abort(self):
+        """Discards a partially written single-pass archive"""
+        if self._tar:
+            self._archive.close()
+            self._partial_path.unlink()
+            self._tar = None
+
+
+def command_output_chunks(process, stderr_file):
+    """Yields a process's stdout in chunks and raises if it exits unsuccessfully"""
+    for chunk in iter(lambda: process.stdout.read(STREAM_CHUNK_SIZE), b""):
+        yield chunk
+    process.wait()
+    if process.returncode != 0:
+        stderr_file.seek(0)
+        stderr = stderr_file.read().decode(errors="replace")
+        raise RuntimeError(f"Command failed with code {process.returncode}: {stderr}")
+
+
+def strip_journal_cursor(chunks, cursor):
+    """Passes journalctl output through without the "-- cursor: <cursor>" line --show-cursor ends it with
+
+    The last line is held back until the output ends. If it is the cursor line, the cursor
+    is appended to the list cursor instead of being passed on.
+    """
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        cut = pending.rfind(b"\n", 0, len(pending) - 1) + 1
+        if cut:
+            yield pending[:cut]
+            pending = pending[cut:]
+    if pending.startswith(JOURNAL_CURSOR_PREFIX.encode()):
+        cursor.append(pending[len(JOURNAL_CURSOR_PREFIX) :].strip().decode())
+    elif pending:
+        yield pending
+
+
+def kill_process_group(process):
+    """Kills a process started in its own session together with its children"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def stream_command(command, writer, relpath, shell=False, chunk_filter=None, timeout=None):
+    """Runs a command and streams its stdout through the writer into relpath, through chunk_filter if given"""
+    timeout = timeout or COMMAND_TIMEOUT
+    try:
+        with tempfile.TemporaryFile() as stderr:
+            # Run in its own session so a timeout also kills children still holding the pipe
+            process = subprocess.Popen(
+                command, shell=shell, stdout=subprocess.PIPE, stderr=stderr, start_new_session=True
+            )
+            timer = threading.Timer(timeout, kill_process_group, (process,))
+            timer.start()
+            try:
+                chunks = command_output_chunks(process, stderr)
+                if chunk_filter is not None:
+                    chunks = chunk_filter(chunks)
+                path = writer.write(relpath, chunks)
+            except Exception as e:
+                process.kill()
+                process.wait()
+                if process.returncode == -9 and not timer.is_alive():
+                    return False, f"Command timed out after {timeout} seconds"
+                return False, str(e)
+            finally:
+                timer.cancel()
+                process.stdout.close()
+        return True, path
+    except Exception as e:
+        return False, f"Error executing command: {e}"
+
+
+def run_command_to(command, writer=None, relpath=None, shell=False, chunk_filter=None, timeout=None):
+    """Streams a command through the writer when given, otherwise returns its output in memory
+
+    chunk_filter only applies to streamed output.
+    """
+    if writer is not None:
+        return stream_command(command, writer, relpath, shell=shell, chunk_filter=chunk_filter, timeout=timeout)
+    return run_command(command, shell=shell, timeout=timeout)
+
+
+def load_collection_state():
+    """Loads the high-water marks persisted by the previous incremental run"""
+    state = {"journal_cursors": {}, "container_log_times": {}}
+    try:
+        if STATE_FILE.exists():
+            with open(STATE_FILE) as f:
+                loaded = yaml.safe_load(f) or {}
+            for key in state:
+                state[key].update(loaded.get(key) or {})
+            logger.info(
+                f"Loaded incremental state for {len(state['journal_cursors'])} journals "
+                f"and {len(state['container_log_times'])} containers"
+            )
+    except Exception as e:
+        logger.warning(f"Failed to load incremental state from {STATE_FILE}, collecting everything: {e}")
+    return state
+
+
+def save_collection_state(state):
+    """Atomically persists the high-water marks for the next incremental run"""
+    partial_file = STATE_FILE.with_name(STATE_FILE.name + ".part")
+    with open(partial_file, "w") as f:
+        yaml.safe_dump(state, f, default_flow_style=False)
+    os.replace(partial_file, STATE_FILE)
+    logger.info(f"Saved incremental state to {STATE_FILE}")
+
+
+def restore_truncated_log_times(state, previous_log_times, truncated):
+    """Puts back the previous high-water mark of every container log the byte budget truncated
+
+    The lines the budget dropped were never stored, so the next run has to fetch them again.
+    """
+    for relpath in truncated:
+        parts = PurePosixPath(relpath).parts
+        if parts[0] != "pods" or len(parts) != 3:
+            continue
+        # Pod and container names cannot hold underscores
+        pod_name, _, container = PurePosixPath(relpath).stem.rpartition("_")
+        state_key = f"{parts[1]}/{pod_name}/{container}"
+        if state_key in previous_log_times:
+            state["container_log_times"][state_key] = previous_log_times[state_key]
+        else:
+            state["container_log_times"].pop(state_key, None)
+
+
+def journal_window_args(cursor=None):
+    """Returns journalctl arguments for the shared time window, resuming after cursor if given
+
+    journalctl does not accept --since together with a cursor, so the cursor wins.
+    """
+    args = ["--after-cursor", cursor] if cursor else ["--since", JOURNAL_SINCE] if JOURNAL_SINCE else []
+    if JOURNAL_UNTIL:
+        args += ["--until", JOURNAL_UNTIL]
+    return args
+
+
+def run_journal_command(name, cmd, writer=None, relpath=None, state=None):
+    """Runs a journalctl command, resuming after the cursor stored for name in incremental mode"""
+    timeout = command_timeout(name)
+    cursor = state["journal_cursors"].get(name) if state is not None else None
+    window = journal_window_args(cursor)
+    if TIMELINE:
+        # The default short format has no year, so the timeline asks for full UTC timestamps
+        cmd = f"{cmd} -o short-iso-precise --utc"
+    if window:
+        cmd = f"{cmd} {shlex.join(window)}"
+    if state is None:
+        return run_command_to(cmd, writer, relpath, shell=True, timeout=timeout)
+
+    cmd = f"{cmd} --show-cursor"
+
+    # journalctl ends its output with "-- cursor: <cursor>" when there were new entries,
+    # which is taken off before the journal is stored
+    new_cursor = []
+    chunk_filter = partial(strip_journal_cursor, cursor=new_cursor)
+    success, output = run_command_to(cmd, writer, relpath, shell=True, chunk_filter=chunk_filter, timeout=timeout)
+    if success and isinstance(output, str):
+        lines = output.splitlines(keepends=True)
+        if lines and lines[-1].startswith(JOURNAL_CURSOR_PREFIX):
+            new_cursor.append(lines.pop()[len(JOURNAL_CURSOR_PREFIX) :].strip())
+            output = "".join(lines)
+    if success and new_cursor:
+        state["journal_cursors"][name] = new_cursor[0]
+    return success, output
+
+
+def journal_relpath(name):
+    """Returns where the journal of a NODE_SERVICES or configuration source is stored"""
+    return f"{'node' if name in NODE_SERVICES else 'configs'}/{name}{JOURNAL_EXTENSION}"
+
+
+def journal_json_entries(stream):
+    """Yields (entry, fields) for each line of journalctl -o json output
+
+    Only the cursor and unit fields are extracted, with a regex rather than a full JSON parse.
+    """
+    for line in stream:
+        if line.strip():
+            yield line, dict(JSON_JOURNAL_FIELD.findall(line))
+
+
+def journal_export_entries(stream, keep=()):
+    """Yields (entry, fields) for each entry of journalctl -o export output
+
+    Entries end with an empty line. Binary fields are a name line followed by a
+    little-endian 64-bit length, the data and a newline. Besides the cursor and unit
+    fields, the fields named in keep are extracted.
+    """
+    entry, fields = [], {}
+    while True:
+        line = stream.readline()
+        if line in (b"", b"\n"):
+            if entry:
+                yield b"".join(entry) + b"\n", fields
+                entry, fields = [], {}
+            if not line:
+                return
+            continue
+
+        entry.append(line)
+        key, separator, value = line.partition(b"=")
+        if not separator:
+            size = stream.read(8)
+            data = stream.read(int.from_bytes(size, "little") + 1)
+            entry += [size, data]
+            if line[:-1] in keep:
+                fields[line[:-1]] = data[:-1]
+        elif key == b"__CURSOR" or key in JOURNAL_UNIT_FIELDS or key in keep:
+            fields[key] = value[:-1]
+
+
+def export_journal(names, writer, state=None, extra_args=()):
+    """Exports the journals of several sources with one journalctl call in JOURNAL_MODE
+
+    Entries are routed to a source by their unit fields and streamed into per-source spool
+    files, which are then copied into the collection. Sources in JOURNAL_UNIT_LINES instead
+    keep their last entries in memory, so a chatty unit is bounded as in text mode. A single
+    source without JOURNAL_UNITS takes the whole journal. Returns {name: (success, path or
+    error text)}.
+    """
+    key = "+".join(names)
+    routes = {
+        (unit if "." in unit else f"{unit}.service").encode(): name
+        for name in names
+        for unit in JOURNAL_UNITS.get(name, [])
+    }
+    cursor = state["journal_cursors"].get(key) if state is not None else None
+    command = ["journalctl", "-o", JOURNAL_MODE, "--no-pager", *extra_args, *journal_window_args(cursor)]
+    command += [f"--unit={unit.decode()}" for unit in routes]
+    parse_entries = journal_json_entries if JOURNAL_MODE == "json" else journal_export_entries
+    timeout = command_timeout("journal")
+
+    try:
+        with tempfile.TemporaryDirectory(dir=LOG_DIR) as spool_dir, tempfile.TemporaryFile() as stderr:
+            spools = {name: open(Path(spool_dir) / name, "wb") for name in names if name not in JOURNAL_UNIT_LINES}
+            latest = {name: deque(maxlen=JOURNAL_UNIT_LINES[name]) for name in names if name in JOURNAL_UNIT_LINES}
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr, start_new_session=True)
+            timed_out = threading.Event()
+            timer = threading.Timer(timeout, lambda: (timed_out.set(), kill_process_group(process)))
+            timer.start()
+            last_cursor = None
+            try:
+                for entry, fields in parse_entries(process.stdout):
+                    if routes:
+                        units = (fields.get(field) for field in JOURNAL_UNIT_FIELDS)
+                        name = next((routes[unit] for unit in units if unit in routes), None)
+                    else:
+                        name = names[0]
+                    if name in latest:
+                        latest[name].append(entry)
+                    elif name:
+                        spools[name].write(entry)
+                    last_cursor = fields.get(b"__CURSOR", last_cursor)
+                process.wait()
+            finally:
+                timer.cancel()
+                process.stdout.close()
+                for spool in spools.values():
+                    spool.close()
+
+            if timed_out.is_set():
+                return dict.fromkeys(names, (False, f"Command timed out after {timeout} seconds"))
+            if process.returncode != 0:
+                stderr.seek(0)
+                error = f"Command failed with code {process.returncode}: {stderr.read().decode(errors='replace')}"
+                return dict.fromkeys(names, (False, error))
+
+            if state is not None and last_cursor:
+                state["journal_cursors"][key] = last_cursor.decode()
+            return {
+                name: (
+                    True,
+                    writer.write(journal_relpath(name), list(latest[name]))
+                    if name in latest
+                    else writer.copy_file(journal_relpath(name), Path(spool_dir) / name),
+                )
+                for name in names
+            }
+    except Exception as e:
+        return dict.fromkeys(names, (False, f"Error executing command: {e}"))
+
+
+def collect_unit_journals(writer, state=None):
+    """Exports the journals of every unit-based source that is not skipped with a single journalctl
+
+    A coordinator leaves the node journals to its node agents, as node_logs does.
+    """
+    names = [
+        name
+        for name in JOURNAL_UNITS
+        if not (SKIP_NODE_LOGS or COORDINATOR if name in NODE_SERVICES else SKIP_K8S_CONFIGS)
+    ]
+    logger.info(f"Exporting {JOURNAL_MODE} journals for {', '.join(names)}")
+    with command_slots, telemetry.timed_call("journals", "journalctl"):
+        return export_journal(names, writer, state)
+
+
+def collect_node_logs(writer=None, state=None, journals=None):
+    """Collects logs from system services on the host node
+
+    Sources already exported by collect_unit_journals are taken from journals. In the
+    json/export modes the remaining ones are exported with their own journalctl call.
+    """
     logs = {}
+    journals = journals or {}
     progress = ProgressTracker(len(NODE_SERVICES), "Node log collection")
 
-    for name, cmd in NODE_SERVICES.items():
-        success, output = run_command(cmd, shell=True)
+    if JOURNAL_MODE == "text":
+        tasks = {
+            name: partial(run_journal_command, name, cmd, writer, journal_relpath(name), state)
+            for name, cmd in NODE_SERVICES.items()
+            if name not in journals
+        }
+    else:
+        tasks = {
+            name: lambda name=name, cmd=cmd: export_journal([name], writer, state, shlex.split(cmd)[1:])[name]
+            for name, cmd in NODE_SERVICES.items()
+            if name not in journals
+        }
+    results = run_parallel(tasks, on_complete=progress.update, phase="node_logs")
+
+    for name in NODE_SERVICES:
+        if name in journals:
+            progress.update()
+        success, output = journals[name] if name in journals else results[name]
         logs[name] = output if success else f"Failed to collect logs: {output}"
-        progress.update()
 
     progress.complete()
     return logs
 
 
-def collect_host_file_logs():
-    """Collects log files from host filesystem paths"""
+def collect_host_file_logs(writer=None):
+    """Collects log files from host filesystem paths
+
+    With a writer, each file is copied straight into the collection and only its path is kept.
+    """
     logs = {}
     progress = ProgressTracker(len(HOST_LOG_PATHS), "Host file log collection")
 
@@ -196,10 +1984,23 @@ def collect_host_file_logs():
             continue
 
         logs[name] = {}
+        tail_lines, tail_bytes = HOST_LOG_TAIL_LINES.get(name), HOST_LOG_TAIL_BYTES.get(name)
+        if tail_lines or tail_bytes:
+            logger.info(f"Collecting the tail of {name} logs (lines: {tail_lines or 'all'}, bytes: {tail_bytes or 'all'})")
         try:
             for log_file in sorted(log_dir.glob("*.log")):
                 try:
-                    logs[name][log_file.name] = log_file.read_text()
+                    with telemetry.timed_call("host_file_logs", str(log_file)):
+                        start = 0
+                        if tail_lines or tail_bytes:
+                            start = tail_offset(log_file, tail_lines, tail_bytes)
+                        if writer:
+                            relpath = f"node/{name}/{log_file.name}"
+                            logs[name][log_file.name] = writer.copy_file(relpath, log_file, start)
+                        else:
+                            with open(log_file, "rb") as f:
+                                f.seek(start)
+                                logs[name][log_file.name] = f.read().decode(errors="replace")
                 except Exception as e:
                     logs[name][log_file.name] = f"Failed to read: {e}"
         except Exception as e:
@@ -212,19 +2013,57 @@ def collect_host_file_logs():
     return logs
 
 
-def collect_k8s_configs(v1_api):
-    """Collects Kubernetes configuration and state information"""
+def collect_k8s_configs(v1_api, writer=None, state=None, journals=None):
+    """Collects Kubernetes configuration and state information
+
+    Metal3 and PTP journals already exported by collect_unit_journals are taken from journals.
+    """
     data = {}
+    journals = journals or {}
     logger.info("Collecting Kubernetes configuration information")
 
     try:
         # Get namespaces
-        namespaces = v1_api.list_namespace()
+        with telemetry.timed_call("k8s_configs", "list namespaces"):
+            namespaces = v1_api.list_namespace()
         data["namespaces"] = [ns.metadata.name for ns in namespaces.items]
         logger.info(f"Collected information for {len(data['namespaces'])} namespaces")
 
+        # Run the Helm query and the Metal3/PTP journal queries concurrently
+        tasks = {
+            "helm": partial(run_command, ["helm", "list", "-A", "-o", "yaml"], timeout=command_timeout("helm")),
+            "metal3": partial(
+                run_journal_command,
+                "metal3",
+                "journalctl -u ironic -u metal3 -n 1000 --no-pager",
+                writer,
+                "configs/metal3.log",
+                state,
+            ),
+            "ptp4l": partial(
+                run_journal_command,
+                "ptp4l",
+                "journalctl -u ptp4l -n 1000 --no-pager",
+                writer,
+                "configs/ptp4l.log",
+                state,
+            ),
+            "phc2sys": partial(
+                run_journal_command,
+                "phc2sys",
+                "journalctl -u phc2sys -n 1000 --no-pager",
+                writer,
+                "configs/phc2sys.log",
+                state,
+            ),
+        }
+        results = run_parallel(
+            {name: task for name, task in tasks.items() if name not in journals}, phase="k8s_configs"
+        )
+        results.update({name: journals[name] for name in tasks if name in journals})
+
         # Get Helm releases
-        success, helm_output = run_command(["helm", "list", "-A", "-o", "yaml"])
+        success, helm_output = results["helm"]
         if success:
             data["helm_releases"] = yaml.safe_load(helm_output)
             logger.info(
@@ -235,7 +2074,7 @@ def collect_k8s_configs(v1_api):
             data["helm_releases"] = []
 
         # Collect Metal3 logs
-        success, metal3_logs = run_command("journalctl -u ironic -u metal3 -n 1000 --no-pager", shell=True)
+        success, metal3_logs = results["metal3"]
         if success:
             data["metal3_logs"] = metal3_logs
             logger.info("Collected Metal3 logs")
@@ -244,7 +2083,7 @@ def collect_k8s_configs(v1_api):
             data["metal3_logs"] = "No Metal3 logs available"
 
         # Collect PTP logs
-        success, ptp4l_logs = run_command("journalctl -u ptp4l -n 1000 --no-pager", shell=True)
+        success, ptp4l_logs = results["ptp4l"]
         if success:
             data["ptp4l_logs"] = ptp4l_logs
             logger.info("Collected ptp4l logs")
@@ -252,7 +2091,7 @@ def collect_k8s_configs(v1_api):
             logger.warning(f"Failed to collect ptp4l logs: {ptp4l_logs}")
             data["ptp4l_logs"] = "No ptp4l logs available"
 
-        success, phc2sys_logs = run_command("journalctl -u phc2sys -n 1000 --no-pager", shell=True)
+        success, phc2sys_logs = results["phc2sys"]
         if success:
             data["phc2sys_logs"] = phc2sys_logs
             logger.info("Collected phc2sys logs")
@@ -266,60 +2105,307 @@ def collect_k8s_configs(v1_api):
     return data
 
 
-def collect_pod_logs(v1_api):
-    """Collects logs from pods, optionally filtered by namespace"""
-    pod_logs = {}
+def fetch_container_log(v1_api, namespace, pod_name, container, writer=None, since_seconds=None):
+    """Fetches the tail of a single container log and returns (success, log or error text)
+
+    When a writer is given the chunked HTTP response is streamed through it into the
+    container's log file and the file path is returned instead of the log text.
+    """
+    log_args = {
+        "name": pod_name,
+        "namespace": namespace,
+        "container": container,
+        "tail_lines": MAX_POD_LOG_LINES,
+        "since_seconds": since_seconds,
+    }
+    if TIMELINE:
+        # The timeline orders pod log lines by the timestamp the kubelet prefixes them with
+        log_args["timestamps"] = True
+    if writer is not None and writer.budget and writer.budget.exhausted("pod_logs"):
+        writer.budget.record_skip("pod_logs")
+        return False, "Error: skipped, the pod log share of NESSIE_MAX_LOG_SIZE is spent"
 
     try:
-        # Get pods with optional namespace filtering
-        if NAMESPACES_FILTER:
-            pods = []
-            for ns in NAMESPACES_FILTER:
-                try:
-                    ns_pods = v1_api.list_namespaced_pod(ns).items
-                    pods.extend(ns_pods)
-                    logger.info(f"Collected {len(ns_pods)} pods from namespace {ns}")
-                except Exception as e:
-                    logger.warning(f"Failed to get pods in namespace {ns}: {e}")
-        else:
-            pods = v1_api.list_pod_for_all_namespaces(watch=False).items
-            logger.info(f"Collected {len(pods)} pods from all namespaces")
+        with telemetry.timed_call("pod_logs", f"{namespace}/{pod_name}/{container}"):
+            if writer is None:
+                return True, v1_api.read_namespaced_pod_log(**log_args)
+
+            response = v1_api.read_namespaced_pod_log(**log_args, _preload_content=False)
+            try:
+                path = writer.write(f"pods/{namespace}/{pod_name}_{container}.log", response.stream(STREAM_CHUNK_SIZE))
+                return True, path
+            finally:
+                response.release_conn()
+    except Exception as e:
+        return False, f"Error: {str(e)}"
 
-        progress = ProgressTracker(len(pods), "Pod log collection")
 
-        # Collect logs from each container in each pod
-        for pod in pods:
-            pod_name = pod.metadata.name
-            namespace = pod.metadata.namespace
-            containers = [c.name for c in pod.spec.containers]
+def list_pods_in_pages(v1_api, namespace, page_queue):
+    """Lists pods in chunks of POD_LIST_PAGE_SIZE and puts each page on page_queue as it arrives
 
-            pod_logs[f"{namespace}/{pod_name}"] = {}
+    A namespace of None lists pods across all namespaces. The listing ends with a
+    (namespace, None) marker, preceded by (namespace, exception) if it failed. When the
+    API server expires the continue token (410 Gone) the listing starts over, so pages
+    can repeat pods that were already put on the queue.
+    """
+    continue_token = None
+    restarts = 0
+    try:
+        while True:
+            list_args = {"limit": POD_LIST_PAGE_SIZE}
+            if continue_token:
+                list_args["_continue"] = continue_token
+            try:
+                with telemetry.timed_call("pod_logs", f"list pods in {namespace or 'all namespaces'}"):
+                    if namespace:
+                        page = v1_api.list_namespaced_pod(namespace, **list_args)
+                    else:
+                        page = v1_api.list_pod_for_all_namespaces(watch=False, **list_args)
+            except Exception as e:
+                if not continue_token or getattr(e, "status", None) != 410 or restarts == POD_LIST_RESTARTS:
+                    raise
+                restarts += 1
+                logger.warning(f"Pod listing of {namespace or 'all namespaces'} expired, starting over: {e}")
+                continue_token = None
+                continue
+            page_queue.put((namespace, page.items))
+            continue_token = page.metadata._continue
+            if not continue_token:
+                break
+    except Exception as e:
+        page_queue.put((namespace, e))
+    finally:
+        page_queue.put((namespace, None))
 
-            for container in containers:
-                try:
-                    log_data = v1_api.read_namespaced_pod_log(
-                        name=pod_name, namespace=namespace, container=container, tail_lines=MAX_POD_LOG_LINES
-                    )
-                    pod_logs[f"{namespace}/{pod_name}"][container] = log_data
-                except Exception as e:
-                    pod_logs[f"{namespace}/{pod_name}"][container] = f"Error: {str(e)}"
 
+def collect_pod_logs(v1_api, writer=None, state=None):
+    """Collects logs from pods, optionally filtered by namespace
+
+    Pods are listed in pages and their container logs are fetched as soon as each
+    page arrives, so pod discovery and log download overlap. If a listing fails part
+    way, the logs of the pods listed until then are still kept, and the failure is
+    reported under "error".
+    """
+    pod_logs = {}
+    fetch_time = time.time()
+    previous_log_times = state["container_log_times"] if state else {}
+    log_times = {}
+
+    # Get pods with optional namespace filtering, one paged listing per source
+    sources = NAMESPACES_FILTER or [None]
+    page_queue = queue.Queue()
+    progress = ProgressTracker(0, "Pod log collection")
+    futures = {}
+    pending = {}
+    listing_errors = []
+
+    def record(future):
+        pod_key, container = futures.pop(future)
+        success, pod_logs[pod_key][container] = future.result()
+        state_key = f"{pod_key}/{container}"
+        if success:
+            log_times[state_key] = fetch_time
+        elif state_key in previous_log_times:
+            log_times[state_key] = previous_log_times[state_key]
+        pending[pod_key] -= 1
+        if pending[pod_key] == 0:
             progress.update()
 
+    try:
+        with ThreadPoolExecutor(max_workers=len(sources)) as lister, ThreadPoolExecutor(
+            max_workers=POD_LOG_WORKERS
+        ) as executor:
+            for ns in sources:
+                lister.submit(list_pods_in_pages, v1_api, ns, page_queue)
+
+            pod_counts = dict.fromkeys(sources, 0)
+            active_sources = len(sources)
+            while active_sources:
+                ns, page = page_queue.get()
+                if page is None:
+                    active_sources -= 1
+                    logger.info(f"Collected {pod_counts[ns]} pods from {f'namespace {ns}' if ns else 'all namespaces'}")
+                    continue
+                if isinstance(page, Exception):
+                    if ns is None:
+                        logger.error(f"Failed to list pods across all namespaces: {page}")
+                        listing_errors.append(f"Failed to list pods: {page}")
+                    else:
+                        logger.warning(f"Failed to get pods in namespace {ns}: {page}")
+                    continue
+
+                pod_counts[ns] += len(page)
+                progress.add_items(len(page))
+
+                # Fan out one fetch per container, tracking how many are still pending for each pod
+                for pod in page:
+                    pod_name = pod.metadata.name
+                    namespace = pod.metadata.namespace
+                    containers = [c.name for c in pod.spec.containers]
+                    pod_key = f"{namespace}/{pod_name}"
+                    if pod_key in pod_logs:
+                        # Already listed before the listing started over
+                        continue
+
+                    pod_logs[pod_key] = dict.fromkeys(containers)
+                    pending[pod_key] = len(containers)
+                    if not containers:
+                        progress.update()
+
+                    for container in containers:
+                        # Only ask for lines logged since the previous incremental run, with a second of overlap
+                        last_time = previous_log_times.get(f"{pod_key}/{container}")
+                        since_seconds = int(fetch_time - last_time) + 1 if last_time else None
+                        future = executor.submit(
+                            fetch_container_log, v1_api, namespace, pod_name, container, writer, since_seconds
+                        )
+                        futures[future] = (pod_key, container)
+
+                # Record whatever finished while this page was being listed
+                done, _ = wait(list(futures), timeout=0, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record(future)
+
+            for future in as_completed(list(futures)):
+                record(future)
+
         progress.complete()
 
+        # Containers that no longer exist drop out of the state, unless the listing
+        # failed and they may simply not have been listed
+        if state is not None:
+            state["container_log_times"] = {**previous_log_times, **log_times} if listing_errors else log_times
+
     except Exception as e:
         logger.error(f"Error collecting pod logs: {e}")
-        pod_logs["error"] = str(e)
+        listing_errors.append(str(e))
 
+    # Containers whose fetch never completed have no log to save
+    for pod_key, containers in pod_logs.items():
+        pod_logs[pod_key] = {container: log for container, log in containers.items() if log is not None}
+    if listing_errors:
+        pod_logs["error"] = "; ".join(listing_errors)
     return pod_logs
 
 
+class MetricSeries:
+    """Samples of one node or pod, kept as compact columns of timestamps, CPU nanocores and memory bytes"""
+
+    def __init__(self):
+        self.timestamps = array("d")
+        self.cpu = array("q")
+        self.memory = array("q")
+
+    def add(self, timestamp, cpu, memory):
+        """Appends a sample, unless metrics-server has not refreshed it since the previous one"""
+        if self.timestamps and self.timestamps[-1] == timestamp:
+            return
+        self.timestamps.append(timestamp)
+        self.cpu.append(cpu)
+        self.memory.append(memory)
+
+    def summary(self):
+        """Returns the sample count and the min/avg/max of CPU and memory"""
+        return {
+            "samples": len(self.timestamps),
+            "cpu_nanocores": {"min": min(self.cpu), "avg": sum(self.cpu) // len(self.cpu), "max": max(self.cpu)},
+            "memory_bytes": {
+                "min": min(self.memory),
+                "avg": sum(self.memory) // len(self.memory),
+                "max": max(self.memory),
+            },
+        }
+
+
+def metric_usage(item, polled):
+    """Returns (timestamp, CPU nanocores, memory bytes) of a node or pod metrics item
+
+    A pod's usage is the sum of its containers. The timestamp is when metrics-server
+    scraped the usage, falling back to polled.
+    """
+    if "containers" in item:
+        usages = [container.get("usage", {}) for container in item["containers"]]
+    else:
+        usages = [item.get("usage", {})]
+    cpu = sum(int(parse_quantity(usage.get("cpu", "0")) * 10**9) for usage in usages)
+    memory = sum(int(parse_quantity(usage.get("memory", "0"))) for usage in usages)
+    try:
+        timestamp = datetime.fromisoformat(item["timestamp"].replace("Z", "+00:00")).timestamp()
+    except (KeyError, ValueError):
+        timestamp = polled
+    return timestamp, cpu, memory
+
+
+def sample_metrics(custom_api):
+    """Polls node, and with METRICS_PODS pod, metrics METRICS_SAMPLES times, METRICS_INTERVAL seconds apart
+
+    Runs alongside the other collectors, sleeping between polls. Returns the MetricSeries
+    of every node under "nodes" and of every pod under "pods".
+    """
+    kinds = ["nodes", "pods"] if METRICS_PODS else ["nodes"]
+    series = {kind: {} for kind in kinds}
+    failures = dict.fromkeys(kinds, 0)
+    errors = {}
+    logger.info(f"Sampling {' and '.join(kinds)} metrics {METRICS_SAMPLES} times, {METRICS_INTERVAL:g} seconds apart")
+
+    start = time.time()
+    for sample in range(METRICS_SAMPLES):
+        time.sleep(max(0.0, start + sample * METRICS_INTERVAL - time.time()))
+        polled = time.time()
+        for kind in kinds:
+            try:
+                with telemetry.timed_call("node_metrics", f"list {kind[:-1]} metrics"):
+                    response = custom_api.list_cluster_custom_object("metrics.k8s.io", "v1beta1", kind)
+            except Exception as e:
+                failures[kind] += 1
+                errors[kind] = str(e)
+                continue
+            for item in response.get("items", []):
+                metadata = item.get("metadata", {})
+                name = f"{metadata.get('namespace')}/{metadata.get('name')}" if kind == "pods" else metadata.get("name")
+                series[kind].setdefault(name, MetricSeries()).add(*metric_usage(item, polled))
+
+    if failures["nodes"] == METRICS_SAMPLES:
+        logger.warning(f"Metrics server not available: {errors['nodes']}")
+        return {"error": errors["nodes"]}
+    pods = f" and {len(series['pods'])} pods" if METRICS_PODS else ""
+    logger.info(f"Sampled metrics of {len(series['nodes'])} nodes{pods}")
+    result = {"samples": METRICS_SAMPLES, "interval_seconds": METRICS_INTERVAL, **series}
+    if any(failures.values()):
+        result["failed_polls"] = {
+            kind: {"count": count, "last_error": errors[kind]} for kind, count in failures.items() if count
+        }
+    return result
+
+
+def metric_samples_csv(series):
+    """Yields CSV blocks with one row per sample, grouped by node or pod"""
+    yield b"name,timestamp,cpu_nanocores,memory_bytes\n"
+    for name, samples in sorted(series.items()):
+        rows = zip(samples.timestamps, samples.cpu, samples.memory)
+        yield "".join(f"{name},{timestamp:.3f},{cpu},{memory}\n" for timestamp, cpu, memory in rows).encode()
+
+
+def metric_samples_summary(metrics):
+    """Returns the min/avg/max of every sampled node and pod"""
+    summary = {key: metrics[key] for key in ("samples", "interval_seconds", "failed_polls") if key in metrics}
+    for kind in ("nodes", "pods"):
+        if kind in metrics:
+            summary[kind] = {name: samples.summary() for name, samples in sorted(metrics[kind].items())}
+    return summary
+
+
 def collect_node_metrics(custom_api):
-    """Collects node metrics using the Kubernetes metrics API"""
+    """Collects node metrics using the Kubernetes metrics API
+
+    With METRICS_SAMPLES above 1 the metrics are sampled over time instead.
+    """
+    if METRICS_SAMPLES > 1:
+        return sample_metrics(custom_api)
     logger.info("Collecting node metrics")
     try:
-        response = custom_api.list_cluster_custom_object("metrics.k8s.io", "v1beta1", "nodes")
+        with telemetry.timed_call("node_metrics", "list node metrics"):
+            response = custom_api.list_cluster_custom_object("metrics.k8s.io", "v1beta1", "nodes")
         logger.info(f"Collected metrics for {len(response.get('items', []))} nodes")
         return response
     except Exception as e:
@@ -327,55 +2413,352 @@ def collect_node_metrics(custom_api):
         return {"error": str(e)}
 
 
-def collect_versions():
-    """Collects version information for cluster components"""
+def list_namespace_deployments(apps_api, namespace):
+    """Lists the deployments of a namespace, returning (success, deployments or error text)"""
+    try:
+        return True, apps_api.list_namespaced_deployment(namespace).items
+    except Exception as e:
+        return False, str(e)
+
+
+def collect_api_versions(api_client):
+    """Resolves component versions in-process from the Kubernetes API
+
+    Makes one deployment list per namespace instead of forking kubectl per component.
+    Components whose namespace could not be listed are left out so that the caller
+    can fall back to the kubectl commands for them.
+    """
+    versions = {}
+
+    try:
+        with telemetry.timed_call("versions", "get server version"):
+            versions["kubectl"] = f"Server Version: {client.VersionApi(api_client).get_code().git_version}"
+    except Exception as e:
+        logger.warning(f"Failed to get server version from the API: {e}")
+
+    apps_api = client.AppsV1Api(api_client)
+    namespaces = sorted({namespace for namespace, _, _ in DEPLOYMENT_VERSIONS.values()})
+    tasks = {namespace: partial(list_namespace_deployments, apps_api, namespace) for namespace in namespaces}
+    listings = run_parallel(tasks, phase="versions")
+
+    for component, (namespace, name, all_containers) in DEPLOYMENT_VERSIONS.items():
+        success, deployments = listings[namespace]
+        if not success:
+            logger.warning(f"Failed to list deployments in namespace {namespace}: {deployments}")
+            continue
+
+        deployment = next((d for d in deployments if d.metadata.name == name), None)
+        if deployment is None:
+            versions[component] = f"Not available: deployment {name} not found in namespace {namespace}"
+            continue
+
+        images = [c.image for c in deployment.spec.template.spec.containers]
+        versions[component] = " ".join(images) if all_containers else images[0]
+
+    return versions
+
+
+def collect_versions(api_client=None):
+    """Collects version information for cluster components
+
+    Component images are resolved through the Kubernetes API when a client is
+    available; the shell commands in VERSION_COMMANDS cover everything else.
+    """
     versions = {}
     progress = ProgressTracker(len(VERSION_COMMANDS), "Version collection")
 
-    for component, cmd in VERSION_COMMANDS.items():
-        success, output = run_command(cmd, shell=True)
+    api_versions = collect_api_versions(api_client) if api_client else {}
+    if api_versions:
+        progress.update(len(api_versions))
+
+    tasks = {
+        component: partial(run_command, cmd, shell=True, timeout=command_timeout(component))
+        for component, cmd in VERSION_COMMANDS.items()
+        if component not in api_versions
+    }
+    results = run_parallel(tasks, on_complete=progress.update, phase="versions")
+
+    for component in VERSION_COMMANDS:
+        if component in api_versions:
+            versions[component] = api_versions[component]
+            continue
+        success, output = results[component]
         versions[component] = output.strip() if success else f"Not available: {output}"
-        progress.update()
 
     progress.complete()
     return versions
 
 
-def save_text_logs(data, base_dir):
-    """Saves collected logs as individual text files in an organized directory structure"""
-    created_files = []
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    collection_dir = Path(base_dir) / f"nessie_logs_{timestamp}"
+def coordinator_namespace():
+    """Returns the namespace for node collection Jobs: configured, our own, or default"""
+    if COORDINATOR_NAMESPACE:
+        return COORDINATOR_NAMESPACE
+    try:
+        return Path(SERVICE_ACCOUNT_NAMESPACE_FILE).read_text().strip()
+    except OSError:
+        return "default"
+
+
+def node_agent_environment():
+    """Returns the environment of a node agent: our NESSIE_* settings, limited to node-level collection"""
+    env = {
+        name: value
+        for name, value in os.environ.items()
+        if name.startswith("NESSIE_") and not name.startswith(NODE_AGENT_EXCLUDED_ENV)
+    }
+    env.update(NODE_AGENT_ENV)
+    return env
+
+
+def node_job(job_name, node):
+    """Returns a Job that runs a node agent on node with the host journal and HOST_LOG_PATHS mounted"""
+    host_paths = JOURNAL_HOST_PATHS + list(HOST_LOG_PATHS.values())
+    labels = {"app.kubernetes.io/name": "nessie", "app.kubernetes.io/component": "node-agent"}
+    return {
+        "apiVersion": "batch/v1",
+        "kind": "Job",
+        "metadata": {"name": job_name, "labels": labels},
+        "spec": {
+            "backoffLimit": 0,
+            "activeDeadlineSeconds": NODE_TIMEOUT,
+            "ttlSecondsAfterFinished": 60,
+            "template": {
+                "metadata": {"labels": labels},
+                "spec": {
+                    "nodeName": node,
+                    "restartPolicy": "Never",
+                    "terminationGracePeriodSeconds": 5,
+                    "tolerations": [{"operator": "Exists"}],
+                    "containers": [
+                        {
+                            "name": "nessie",
+                            "image": COORDINATOR_IMAGE,
+                            "securityContext": {"privileged": True},
+                            "env": [{"name": name, "value": value} for name, value in node_agent_environment().items()],
+                            "volumeMounts": [
+                                {"name": f"host-{i}", "mountPath": path, "readOnly": True}
+                                for i, path in enumerate(host_paths)
+                            ],
+                        }
+                    ],
+                    "volumes": [{"name": f"host-{i}", "hostPath": {"path": path}} for i, path in enumerate(host_paths)],
+                },
+            },
+        },
+    }
+
+
+def read_pod_file(v1_api, namespace, pod_name, path, destination, deadline):
+    """Copies a file out of a pod into the destination file object over an exec stream
+
+    Returns the number of bytes copied. Raises RuntimeError if the file cannot be read
+    and TimeoutError once deadline passes. The exec stream swaps out the request method
+    of the API client it is called on, so it gets a client of its own.
+    """
+    api_client = client.ApiClient(v1_api.api_client.configuration)
+    response = exec_stream(
+        client.CoreV1Api(api_client).connect_get_namespaced_pod_exec,
+        pod_name,
+        namespace,
+        command=["cat", path],
+        stderr=True,
+        stdin=False,
+        stdout=True,
+        tty=False,
+        binary=True,
+        _preload_content=False,
+    )
+    size = 0
+    stderr = b""
+    try:
+        while True:
+            if time.time() > deadline:
+                raise TimeoutError(f"copying {path} out of pod {pod_name} did not finish in time")
+            is_open = response.is_open()
+            if is_open:
+                response.update(timeout=1)
+            if response.peek_stdout(timeout=0):
+                chunk = response.read_stdout(timeout=0)
+                destination.write(chunk)
+                size += len(chunk)
+            if response.peek_stderr(timeout=0):
+                stderr += response.read_stderr(timeout=0)
+            if not is_open:
+                break
+    finally:
+        response.close()
+        api_client.close()
+    if response.returncode:
+        raise RuntimeError(f"cat {path} failed in pod {pod_name}: {stderr.decode(errors='replace').strip()}")
+    return size
+
+
+def wait_for_node_archive(v1_api, namespace, job_name, deadline):
+    """Waits for a node agent to publish its archive, returning the pod name and archive path"""
+    while time.time() < deadline:
+        pods = v1_api.list_namespaced_pod(namespace, label_selector=f"job-name={job_name}").items
+        for pod in pods:
+            phase = pod.status.phase if pod.status else None
+            if phase in ("Succeeded", "Failed"):
+                raise RuntimeError(f"node agent pod {pod.metadata.name} exited before handing over its archive")
+            if phase != "Running":
+                continue
+            published = io.BytesIO()
+            try:
+                ready_file = f"{NODE_AGENT_LOG_DIR}/{NODE_AGENT_READY_FILE}"
+                read_pod_file(v1_api, namespace, pod.metadata.name, ready_file, published, deadline)
+            except RuntimeError:
+                continue
+            archive_path = published.getvalue().decode().strip()
+            if not archive_path:
+                raise RuntimeError(f"node agent pod {pod.metadata.name} did not create an archive")
+            return pod.metadata.name, archive_path
+        time.sleep(NODE_AGENT_POLL_INTERVAL)
+    raise TimeoutError(f"no archive within {NODE_TIMEOUT} seconds")
+
+
+def merge_node_archive(fileobj, node, writer):
+    """Adds the node files of a node agent's archive to writer under node/<node>/ and returns how many
+
+    The agent's own summary.yaml and manifest.tsv describe its archive, not collected data,
+    so only what the agent collected under node/ is merged.
+    """
+    count = 0
+    with tarfile.open(fileobj=fileobj, mode="r:gz") as tar:
+        for member in tar:
+            if not (member.isfile() or member.islnk()):
+                continue
+            # Drop the agent's nessie_logs_* directory and its node/ level
+            parts = PurePosixPath(member.name).parts[1:]
+            if not parts or parts[0] != "node":
+                continue
+            parts = parts[1:]
+            if not parts or ".." in parts:
+                continue
+            source = tar.extractfile(member)
+            writer.write(str(PurePosixPath("node", node, *parts)), iter(partial(source.read, STREAM_CHUNK_SIZE), b""))
+            count += 1
+    return count
+
+
+def collect_node(v1_api, batch_api, namespace, node, run_id, writer):
+    """Collects one node through a node agent Job pinned to it, deleting the Job afterwards"""
+    deadline = time.time() + NODE_TIMEOUT
+    job_name = f"nessie-node-{hashlib.sha1(node.encode()).hexdigest()[:10]}-{run_id}"
+    with telemetry.timed_call("nodes", node):
+        batch_api.create_namespaced_job(namespace, node_job(job_name, node))
+        try:
+            pod_name, archive_path = wait_for_node_archive(v1_api, namespace, job_name, deadline)
+            with tempfile.TemporaryFile(dir=LOG_DIR) as partial_archive:
+                size = read_pod_file(v1_api, namespace, pod_name, archive_path, partial_archive, deadline)
+                partial_archive.seek(0)
+                files = merge_node_archive(partial_archive, node, writer)
+        finally:
+            try:
+                batch_api.delete_namespaced_job(job_name, namespace, propagation_policy="Background")
+            except Exception as e:
+                logger.warning(f"Failed to delete node collection Job {namespace}/{job_name}: {e}")
+    logger.info(f"Collected {files} files from node {node}")
+    return {"files": files, "archive_bytes": size}
+
+
+def collect_cluster_nodes(v1_api, writer):
+    """Runs node-level collection on every node and merges the results under node/<node>/
+
+    Each node gets a Job running Nessie as a node agent, at most COORDINATOR_WORKERS at a
+    time. A node that does not hand over its archive within NODE_TIMEOUT seconds is
+    reported as failed without holding up the others.
+    """
+    namespace = coordinator_namespace()
+    with telemetry.timed_call("nodes", "list nodes"):
+        nodes = [node.metadata.name for node in v1_api.list_node(label_selector=NODE_SELECTOR or None).items]
+    logger.info(f"Collecting node logs from {len(nodes)} nodes with Jobs in namespace {namespace}")
+
+    batch_api = client.BatchV1Api(v1_api.api_client)
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+    progress = ProgressTracker(len(nodes), "Node collection")
+    results = {}
+    with ThreadPoolExecutor(max_workers=COORDINATOR_WORKERS) as executor:
+        futures = {
+            executor.submit(collect_node, v1_api, batch_api, namespace, node, run_id, writer): node for node in nodes
+        }
+        for future in as_completed(futures):
+            node = futures[future]
+            try:
+                results[node] = future.result()
+            except Exception as e:
+                logger.error(f"Failed to collect node {node}: {e}")
+                results[node] = {"error": str(e)}
+            progress.update()
+    progress.complete()
 
-    # Create directory structure
-    collection_dir.mkdir(exist_ok=True)
+    return {node: results[node] for node in nodes}
+
+
+def reserve_collection_dir(keep_raw):
+    """Returns a nessie_logs_<timestamp> directory name that no other collection uses
+
+    Collections started within the same second, such as a snapshot request and a signal,
+    get a counter suffix. The archive is named after the directory, so it is unique too.
+    The name is claimed by creating the directory, or without a raw directory the partial
+    single-pass archive.
+    """
+    name = f"nessie_logs_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}"
+    for attempt in range(COLLECTION_NAME_ATTEMPTS):
+        collection_dir = Path(LOG_DIR) / (f"{name}_{attempt}" if attempt else name)
+        archive_path = Path(ZIP_DIR) / f"{collection_dir.name}{ARCHIVE_EXTENSION}"
+        if archive_path.exists():
+            continue
+        try:
+            if keep_raw:
+                create_collection_dir(collection_dir)
+            else:
+                open(archive_path.with_name(archive_path.name + ".part"), "x").close()
+        except FileExistsError:
+            continue
+        return collection_dir
+    raise FileExistsError(f"No unused collection name left for {name}")
+
+
+def create_collection_dir(collection_dir):
+    """Creates the collection directory and its category subdirectories"""
+    collection_dir = Path(collection_dir)
+
+    # Never shared with an earlier collection, see reserve_collection_dir
+    collection_dir.mkdir()
     (collection_dir / "node").mkdir(exist_ok=True)
     (collection_dir / "pods").mkdir(exist_ok=True)
     (collection_dir / "configs").mkdir(exist_ok=True)
     (collection_dir / "metrics").mkdir(exist_ok=True)
     (collection_dir / "versions").mkdir(exist_ok=True)
 
+    return collection_dir
+
+
+def save_log_content(writer, relpath, content):
+    """Writes log content to relpath unless a streaming collector already wrote it there"""
+    if isinstance(content, Path):
+        return content
+    return writer.write_text(relpath, content)
+
+
+def save_text_logs(data, writer):
+    """Saves collected logs as individual text files in an organized directory structure"""
+    created_files = []
+
     # Save node logs
     if "node_logs" in data and isinstance(data["node_logs"], dict):
         for service, log_content in data["node_logs"].items():
             if service == "error":
                 continue
-            log_file = collection_dir / "node" / f"{service}.log"
-            with open(log_file, "w") as f:
-                f.write(str(log_content))
-            created_files.append(log_file)
+            created_files.append(save_log_content(writer, f"node/{service}.log", log_content))
 
     # Save host file logs
     if "host_file_logs" in data and isinstance(data["host_file_logs"], dict):
         for source_name, files in data["host_file_logs"].items():
             if isinstance(files, dict) and "error" not in files:
-                source_dir = collection_dir / "node" / source_name
-                source_dir.mkdir(parents=True, exist_ok=True)
                 for filename, content in files.items():
-                    log_file = source_dir / filename
-                    with open(log_file, "w") as f:
-                        f.write(str(content))
-                    created_files.append(log_file)
+                    created_files.append(save_log_content(writer, f"node/{source_name}/{filename}", content))
 
     # Save pod logs
     if "pod_logs" in data and isinstance(data["pod_logs"], dict):
@@ -383,75 +2766,76 @@ def save_text_logs(data, base_dir):
             if pod_key == "error":
                 continue
 
-            # Create namespace directories
+            # Save each container's logs under its namespace directory
             if "/" in pod_key:
                 namespace, pod_name = pod_key.split("/", 1)
-                ns_dir = collection_dir / "pods" / namespace
-                ns_dir.mkdir(exist_ok=True)
-
-                # Save each container's logs
                 for container, log_content in containers.items():
-                    log_file = ns_dir / f"{pod_name}_{container}.log"
-                    with open(log_file, "w") as f:
-                        f.write(str(log_content))
-                    created_files.append(log_file)
+                    log_file = f"pods/{namespace}/{pod_name}_{container}.log"
+                    created_files.append(save_log_content(writer, log_file, log_content))
 
     # Save K8s configuration information
     if "k8s_configs" in data and isinstance(data["k8s_configs"], dict):
         # Save namespaces list
         if "namespaces" in data["k8s_configs"]:
-            namespaces_file = collection_dir / "configs" / "namespaces.txt"
-            with open(namespaces_file, "w") as f:
-                for ns in data["k8s_configs"]["namespaces"]:
-                    f.write(f"{ns}\n")
-            created_files.append(namespaces_file)
+            namespaces = "".join(f"{ns}\n" for ns in data["k8s_configs"]["namespaces"])
+            created_files.append(writer.write_text("configs/namespaces.txt", namespaces))
 
         # Save Helm releases
         if "helm_releases" in data["k8s_configs"]:
-            helm_file = collection_dir / "configs" / "helm_releases.yaml"
-            with open(helm_file, "w") as f:
-                yaml.dump(data["k8s_configs"]["helm_releases"], f)
-            created_files.append(helm_file)
+            helm_releases = yaml.dump(data["k8s_configs"]["helm_releases"])
+            created_files.append(writer.write_text("configs/helm_releases.yaml", helm_releases))
 
         # Save Metal3 logs
         if "metal3_logs" in data["k8s_configs"]:
-            metal3_file = collection_dir / "configs" / "metal3.log"
-            with open(metal3_file, "w") as f:
-                f.write(str(data["k8s_configs"]["metal3_logs"]))
-            created_files.append(metal3_file)
+            metal3_logs = data["k8s_configs"]["metal3_logs"]
+            created_files.append(save_log_content(writer, "configs/metal3.log", metal3_logs))
 
         # Save PTP logs
         if "ptp4l_logs" in data["k8s_configs"]:
-            ptp4l_file = collection_dir / "configs" / "ptp4l.log"
-            with open(ptp4l_file, "w") as f:
-                f.write(str(data["k8s_configs"]["ptp4l_logs"]))
-            created_files.append(ptp4l_file)
+            ptp4l_logs = data["k8s_configs"]["ptp4l_logs"]
+            created_files.append(save_log_content(writer, "configs/ptp4l.log", ptp4l_logs))
 
         if "phc2sys_logs" in data["k8s_configs"]:
-            phc2sys_file = collection_dir / "configs" / "phc2sys.log"
-            with open(phc2sys_file, "w") as f:
-                f.write(str(data["k8s_configs"]["phc2sys_logs"]))
-            created_files.append(phc2sys_file)
-
-    # Save metrics as YAML (more structured)
-    if "node_metrics" in data:
-        metrics_file = collection_dir / "metrics" / "node_metrics.yaml"
-        with open(metrics_file, "w") as f:
-            yaml.dump(data["node_metrics"], f)
-        created_files.append(metrics_file)
+            phc2sys_logs = data["k8s_configs"]["phc2sys_logs"]
+            created_files.append(save_log_content(writer, "configs/phc2sys.log", phc2sys_logs))
+
+    # Save sampled metrics as CSV columns with a summary, and a single snapshot as YAML
+    if "node_metrics" in data and "nodes" in data["node_metrics"]:
+        metrics = data["node_metrics"]
+        for kind in ("nodes", "pods"):
+            if kind in metrics:
+                created_files.append(writer.write(f"metrics/{kind[:-1]}_metrics.csv", metric_samples_csv(metrics[kind])))
+        summary = yaml.dump(metric_samples_summary(metrics), default_flow_style=False)
+        created_files.append(writer.write_text("metrics/metrics_summary.yaml", summary))
+    elif "node_metrics" in data:
+        created_files.append(writer.write_text("metrics/node_metrics.yaml", yaml.dump(data["node_metrics"])))
 
     # Save versions as text file
     if "versions" in data and isinstance(data["versions"], dict):
-        versions_file = collection_dir / "versions" / "component_versions.txt"
-        with open(versions_file, "w") as f:
-            for component, version in data["versions"].items():
-                f.write(f"{component}: {version}\n")
-        created_files.append(versions_file)
-
-    return created_files, collection_dir
+        versions = "".join(f"{component}: {version}\n" for component, version in data["versions"].items())
+        created_files.append(writer.write_text("versions/component_versions.txt", versions))
+
+    return created_files, writer.collection_dir
+
+
+def collection_stats(data, writer):
+    """Returns counts of what a collection gathered, for the summary and the archive catalog"""
+    # File counts come from the totals the writer keeps per source
+    totals = writer.source_totals
+    helm_releases = data.get("k8s_configs", {}).get("helm_releases", [])
+    return {
+        "namespaces": len(data.get("k8s_configs", {}).get("namespaces", [])),
+        "helm_releases": len(helm_releases) if isinstance(helm_releases, list) else 0,
+        "pod_log_files": totals.get("pod_logs", {}).get("files", 0),
+        "node_log_files": totals.get("node_logs", {}).get("files", 0),
+        "config_files": totals.get("k8s_configs", {}).get("files", 0),
+        "components_versioned": len(data.get("versions", {})),
+        "total_files": sum(source["files"] for source in totals.values()),
+        "total_bytes": sum(source["bytes"] for source in totals.values()),
+    }
 
 
-def create_summary_report(data, start_time, collection_dir):
+def create_summary_report(data, start_time, writer):
     """Creates a summary report of the collected data"""
     logger.info("Creating summary report")
 
@@ -460,8 +2844,18 @@ def create_summary_report(data, start_time, collection_dir):
         "NESSIE_LOG_DIR": LOG_DIR,
         "NESSIE_ZIP_DIR": ZIP_DIR,
         "NESSIE_MAX_LOG_SIZE": str(MAX_LOG_SIZE // (1024 * 1024)) + " MB",
+        "NESSIE_LOG_SIZE_WEIGHTS": LOG_SIZE_WEIGHTS,
+        "NESSIE_HOST_LOG_TAIL_LINES": HOST_LOG_TAIL_LINES,
+        "NESSIE_HOST_LOG_TAIL_BYTES": HOST_LOG_TAIL_BYTES,
         "NESSIE_RETENTION_DAYS": RETENTION_DAYS,
+        "NESSIE_ARCHIVE_QUOTA": f"{ARCHIVE_QUOTA // (1024 * 1024)} MB" if ARCHIVE_QUOTA else "Unlimited",
         "NESSIE_MAX_POD_LOG_LINES": MAX_POD_LOG_LINES,
+        "NESSIE_POD_LOG_WORKERS": POD_LOG_WORKERS,
+        "NESSIE_POD_LIST_PAGE_SIZE": POD_LIST_PAGE_SIZE,
+        "NESSIE_COMMAND_WORKERS": COMMAND_WORKERS,
+        "NESSIE_COMMAND_TIMEOUT": COMMAND_TIMEOUT,
+        "NESSIE_COMMAND_TIMEOUTS": COMMAND_TIMEOUTS,
+        "NESSIE_COLLECTOR_WORKERS": COLLECTOR_WORKERS,
         "NESSIE_NAMESPACES": ",".join(NAMESPACES_FILTER) if NAMESPACES_FILTER else "All",
         "NESSIE_VERBOSE": VERBOSE,
         "NESSIE_SKIP_NODE_LOGS": SKIP_NODE_LOGS,
@@ -470,41 +2864,57 @@ def create_summary_report(data, start_time, collection_dir):
         "NESSIE_SKIP_METRICS": SKIP_METRICS,
         "NESSIE_SKIP_VERSIONS": SKIP_VERSIONS,
         "NESSIE_SKIP_HOST_FILE_LOGS": SKIP_HOST_FILE_LOGS,
+        "NESSIE_STREAM_LOGS": STREAM_LOGS,
+        "NESSIE_SINGLE_PASS_ARCHIVE": SINGLE_PASS_ARCHIVE,
+        "NESSIE_SKIP_RAW_DIR": SKIP_RAW_DIR,
+        "NESSIE_COMPRESSION": COMPRESSION,
+        "NESSIE_COMPRESSION_THREADS": COMPRESSION_THREADS,
+        "NESSIE_ZSTD_LEVEL": ZSTD_LEVEL,
+        "NESSIE_INCREMENTAL": INCREMENTAL,
+        "NESSIE_DEDUP": DEDUP,
+        "NESSIE_REDACT": REDACT,
+        "NESSIE_REDACT_WORKERS": REDACT_WORKERS,
+        "NESSIE_ERROR_INDEX": ERROR_INDEX,
+        "NESSIE_TIMELINE": TIMELINE,
+        "NESSIE_METRICS_SAMPLES": METRICS_SAMPLES,
+        "NESSIE_METRICS_INTERVAL": METRICS_INTERVAL,
+        "NESSIE_METRICS_PODS": METRICS_PODS,
+        "NESSIE_JOURNAL_MODE": JOURNAL_MODE,
+        "NESSIE_JOURNAL_SINCE": JOURNAL_SINCE or "Unbounded",
+        "NESSIE_JOURNAL_UNTIL": JOURNAL_UNTIL or "Unbounded",
+        "NESSIE_PROMETHEUS_TEXTFILE": PROMETHEUS_TEXTFILE or "Disabled",
+        "NESSIE_DAEMON": DAEMON,
+        "NESSIE_COORDINATOR": COORDINATOR,
+        "NESSIE_COORDINATOR_IMAGE": COORDINATOR_IMAGE,
+        "NESSIE_COORDINATOR_WORKERS": COORDINATOR_WORKERS,
+        "NESSIE_NODE_TIMEOUT": NODE_TIMEOUT,
+        "NESSIE_NODE_SELECTOR": NODE_SELECTOR or "All nodes",
     }
 
-    # Count files in each category
-    pod_files = len(list(Path(collection_dir).glob("pods/**/*.log")))
-    node_files = len(list(Path(collection_dir).glob("node/*.log")))
-    config_files = len(list(Path(collection_dir).glob("configs/*")))
-
     summary = {
         "collection_info": {
             "timestamp": datetime.now().isoformat(),
             "duration_seconds": time.time() - start_time,
-            "output_directory": str(collection_dir),
+            "output_directory": str(writer.collection_dir),
             "environment_variables": env_vars,
         },
         "collection_status": {
-            "node_logs": "skipped" if SKIP_NODE_LOGS else "collected" if "node_logs" in data else "failed",
-            "k8s_configs": "skipped" if SKIP_K8S_CONFIGS else "collected" if "k8s_configs" in data else "failed",
-            "pod_logs": "skipped" if SKIP_POD_LOGS else "collected" if "pod_logs" in data else "failed",
-            "node_metrics": "skipped" if SKIP_METRICS else "collected" if "node_metrics" in data else "failed",
-            "versions": "skipped" if SKIP_VERSIONS else "collected" if "versions" in data else "failed",
-            "host_file_logs": "skipped" if SKIP_HOST_FILE_LOGS else "collected" if "host_file_logs" in data else "failed",
-        },
-        "stats": {
-            "namespaces": len(data.get("k8s_configs", {}).get("namespaces", [])),
-            "helm_releases": (
-                len(data.get("k8s_configs", {}).get("helm_releases", []))
-                if isinstance(data.get("k8s_configs", {}).get("helm_releases", []), list)
-                else 0
-            ),
-            "pod_log_files": pod_files,
-            "node_log_files": node_files,
-            "config_files": config_files,
-            "components_versioned": len(data.get("versions", {})),
+            name: "skipped" if collector.skip else "collected" if name in data else "failed"
+            for name, collector in COLLECTORS.items()
         },
+        "stats": collection_stats(data, writer),
+        "performance": {"phases": telemetry.report(writer.source_totals)},
     }
+    if writer.budget:
+        summary["log_size_budget"] = writer.budget.report()
+    if writer.dedup:
+        summary["deduplication"] = writer.dedup_report()
+    if writer.redactor:
+        summary["redaction"] = writer.redactor.report()
+    if writer.error_index:
+        summary["error_index"] = writer.error_index.report()
+    if "nodes" in data:
+        summary["nodes"] = data["nodes"]
 
     # Collect error information
     errors = []
@@ -519,9 +2929,14 @@ def create_summary_report(data, start_time, collection_dir):
 
     # Check for pod logs errors
     if isinstance(data.get("pod_logs", {}), dict):
-        if "error" in data["pod_logs"]:
+        if "error" in data.get("pod_logs", {}):
             errors.append(f"Pod logs: {data['pod_logs']['error']}")
 
+    # Check for nodes the coordinator could not collect
+    for node, result in data.get("nodes", {}).items():
+        if isinstance(result, dict) and "error" in result:
+            errors.append(f"Node '{node}': {result['error']}")
+
     # Check for other component errors
     for component in ["k8s_configs", "node_metrics", "versions", "host_file_logs"]:
         if component in data and "error" in data[component]:
@@ -530,23 +2945,72 @@ def create_summary_report(data, start_time, collection_dir):
     summary["errors"] = errors
 
     # Write summary to file
-    summary_file = Path(collection_dir) / "summary.yaml"
-    with open(summary_file, "w") as f:
-        yaml.dump(summary, f, default_flow_style=False)
+    summary_file = writer.write_text("summary.yaml", yaml.dump(summary, default_flow_style=False))
 
     logger.info(f"Summary report created at {summary_file}")
     return str(summary_file)
 
 
+def write_prometheus_textfile(path, phases, duration, archive_file=None):
+    """Writes collection telemetry in the Prometheus textfile collector format
+
+    The file is written next to its destination and renamed into place so that the
+    node exporter never reads a partial file.
+    """
+    metrics = [
+        ("nessie_phase_duration_seconds", "Wall time spent in each collection phase", "wall_seconds"),
+        ("nessie_phase_bytes", "Bytes written by each collection phase", "bytes"),
+        ("nessie_phase_files", "Files written by each collection phase", "files"),
+        ("nessie_phase_calls", "API requests and subprocesses made by each collection phase", "calls"),
+    ]
+    lines = []
+    for metric, help_text, key in metrics:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+        lines += [f'{metric}{{phase="{name}"}} {stats.get(key, 0)}' for name, stats in phases.items()]
+
+    lines += [
+        "# HELP nessie_phase_call_latency_seconds API request and subprocess latency per collection phase",
+        "# TYPE nessie_phase_call_latency_seconds gauge",
+    ]
+    for name, stats in phases.items():
+        if "call_latency_seconds" in stats:
+            for quantile, value in stats["call_latency_seconds"].items():
+                lines.append(f'nessie_phase_call_latency_seconds{{phase="{name}",quantile="{quantile}"}} {value}')
+
+    lines += [
+        "# HELP nessie_collection_duration_seconds Total duration of the last collection run",
+        "# TYPE nessie_collection_duration_seconds gauge",
+        f"nessie_collection_duration_seconds {duration:.3f}",
+        "# HELP nessie_last_run_timestamp_seconds Unix time at which the last collection run finished",
+        "# TYPE nessie_last_run_timestamp_seconds gauge",
+        f"nessie_last_run_timestamp_seconds {time.time():.0f}",
+    ]
+    if archive_file:
+        lines += [
+            "# HELP nessie_archive_bytes Size of the last collection archive",
+            "# TYPE nessie_archive_bytes gauge",
+            f"nessie_archive_bytes {Path(archive_file).stat().st_size}",
+        ]
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial_path = path.with_name(path.name + ".part")
+    partial_path.write_text("\n".join(lines) + "\n")
+    os.replace(partial_path, path)
+    return path
+
+
 def zip_logs(collection_dir, zip_dir):
     """Creates a compressed archive of collected logs"""
     logger.info("Creating compressed archive")
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    zip_file = Path(zip_dir) / f"nessie_logs_{timestamp}.tar.gz"
+    zip_file = Path(zip_dir) / f"{Path(collection_dir).name}{ARCHIVE_EXTENSION}"
 
     try:
-        with tarfile.open(zip_file, "w:gz") as tar:
-            tar.add(collection_dir, arcname=os.path.basename(collection_dir))
+        archive = ArchiveStream(zip_file)
+        try:
+            archive.tar.add(collection_dir, arcname=os.path.basename(collection_dir))
+        finally:
+            archive.close()
 
         logger.info(f"Archive created at {zip_file}")
         return str(zip_file)
@@ -555,19 +3019,160 @@ def zip_logs(collection_dir, zip_dir):
         return None
 
 
+def read_archive_frames(f, frame_offset, skip, size):
+    """Yields size bytes found skip bytes into the gzip member at frame_offset
+
+    Decompression starts at that member and stops as soon as the bytes are read.
+    """
+    f.seek(frame_offset)
+    decompressor = zlib.decompressobj(31)
+    pending = b""
+    while size > 0:
+        if decompressor.eof:
+            pending, decompressor = decompressor.unused_data, zlib.decompressobj(31)
+        if not pending:
+            pending = f.read(EXTRACT_CHUNK_SIZE)
+            if not pending:
+                raise EOFError("Archive ends before the requested data")
+        data = decompressor.decompress(pending)
+        pending = b""
+        if skip:
+            skipped = min(skip, len(data))
+            data = data[skipped:]
+            skip -= skipped
+        data = data[:size]
+        size -= len(data)
+        if data:
+            yield data
+
+
+def read_archive_index(f):
+    """Returns the member index of an archive written with NESSIE_COMPRESSION=indexed"""
+    f.seek(0, os.SEEK_END)
+    if f.tell() < ARCHIVE_INDEX_TRAILER_SIZE:
+        raise ValueError("Not an indexed Nessie archive")
+    f.seek(-ARCHIVE_INDEX_TRAILER_SIZE, os.SEEK_END)
+    trailer = f.read(ARCHIVE_INDEX_TRAILER_SIZE)
+    if trailer[:4] != b"\x1f\x8b\x08\x04" or trailer[12:14] != ARCHIVE_INDEX_TRAILER_ID:
+        raise ValueError("Not an indexed Nessie archive, extract it with tar instead")
+    frame_offset, frame_start, offset, size = ARCHIVE_INDEX_TRAILER_FIELDS.unpack_from(trailer, 16)
+    return json.loads(b"".join(read_archive_frames(f, frame_offset, offset - frame_start, size)))
+
+
+def extract_from_archive(archive, path, out):
+    """Writes one file from an indexed archive to out, decompressing only the blocks that hold it
+
+    path is taken relative to the collection directory, or as the full name in the archive.
+    """
+    with open(archive, "rb") as f:
+        index = read_archive_index(f)
+        members, links = index["members"], index["links"]
+        name = path if path in members or path in links else f"{index['root']}/{path.lstrip('/')}"
+        # Deduplicated files are hard links to the first copy
+        for _ in range(len(links) + 1):
+            if name not in links:
+                break
+            name = links[name]
+        if name not in members:
+            raise KeyError(f"{path} is not in {archive}")
+        offset, size = members[name]
+        frame = offset // index["frame_size"]
+        skip = offset - frame * index["frame_size"]
+        for data in read_archive_frames(f, index["frames"][frame], skip, size):
+            out.write(data)
+        return size
+
+
+def extract_main(argv):
+    """Runs `nessie extract <archive> [<path>]`: prints one file, or lists the files without a path"""
+    if not argv or argv[0] in ("-h", "--help") or len(argv) > 2:
+        print(f"Usage: {os.path.basename(sys.argv[0])} extract <archive> [<path>]", file=sys.stderr)
+        return 0 if argv and argv[0] in ("-h", "--help") else 2
+    archive = argv[0]
+    try:
+        if len(argv) == 1:
+            with open(archive, "rb") as f:
+                index = read_archive_index(f)
+            for name, (_, size) in sorted(index["members"].items()):
+                print(f"{size}\t{name}")
+            for name, target in sorted(index["links"].items()):
+                print(f"{index['members'].get(target, (0, 0))[1]}\t{name} -> {target}")
+            return 0
+        extract_from_archive(archive, argv[1], sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+        return 0
+    except (OSError, ValueError, KeyError, EOFError, zlib.error) as e:
+        print(f"nessie extract: {e.args[0] if isinstance(e, KeyError) else e}", file=sys.stderr)
+        return 1
+
+
+def load_archive_catalog():
+    """Returns the catalogued archives, oldest first
+
+    Without a readable catalog, one is built from the archives found in ZIP_DIR. This is
+    the only time the directory is scanned.
+    """
+    try:
+        with open(CATALOG_FILE) as f:
+            entries = (yaml.safe_load(f) or {}).get("archives") or []
+        return sorted(entries, key=lambda entry: entry["created"])
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Failed to load archive catalog {CATALOG_FILE}, rebuilding it: {e}")
+
+    entries = []
+    for path in [path for ext in set(ARCHIVE_EXTENSIONS.values()) for path in Path(ZIP_DIR).glob(f"*{ext}")]:
+        stat = path.stat()
+        entries.append(
+            {"name": path.name, "bytes": stat.st_size, "created": datetime.fromtimestamp(stat.st_mtime).isoformat()}
+        )
+    logger.info(f"Built archive catalog from {len(entries)} archives in {ZIP_DIR}")
+    return sorted(entries, key=lambda entry: entry["created"])
+
+
+def save_archive_catalog(entries):
+    """Atomically writes the archive catalog"""
+    partial_file = CATALOG_FILE.with_name(CATALOG_FILE.name + ".part")
+    with open(partial_file, "w") as f:
+        yaml.safe_dump({"archives": entries}, f, default_flow_style=False)
+    os.replace(partial_file, CATALOG_FILE)
+
+
+def catalog_archive(archive_file, stats):
+    """Records a new archive with its size, creation time and collection stats"""
+    path = Path(archive_file)
+    entries = [entry for entry in load_archive_catalog() if entry["name"] != path.name]
+    entries.append(
+        {"name": path.name, "bytes": path.stat().st_size, "created": datetime.now().isoformat(), "stats": stats}
+    )
+    save_archive_catalog(entries)
+
+
 def enforce_retention():
-    """Deletes log archives older than the retention period"""
+    """Deletes archives older than the retention period, then the oldest until NESSIE_ARCHIVE_QUOTA is met
+
+    Ages and sizes come from the archive catalog, so ZIP_DIR is not rescanned. The newest
+    archive is kept even if it exceeds the quota on its own.
+    """
     logger.info(f"Enforcing {RETENTION_DAYS} day retention policy")
-    deleted_count = 0
 
     try:
-        for path in Path(ZIP_DIR).glob("*.tar.gz"):
-            file_time = datetime.fromtimestamp(path.stat().st_ctime)
-            if datetime.now() - file_time > timedelta(days=RETENTION_DAYS):
-                path.unlink()
-                deleted_count += 1
-
-        logger.info(f"Deleted {deleted_count} old log archives")
+        entries = load_archive_catalog()
+        cutoff = (datetime.now() - timedelta(days=RETENTION_DAYS)).isoformat()
+        expired = [entry for entry in entries if entry["created"] < cutoff]
+        kept = [entry for entry in entries if entry["created"] >= cutoff]
+        total = sum(entry["bytes"] for entry in kept)
+        while ARCHIVE_QUOTA and total > ARCHIVE_QUOTA and len(kept) > 1:
+            entry = kept.pop(0)
+            expired.append(entry)
+            total -= entry["bytes"]
+
+        for entry in expired:
+            (Path(ZIP_DIR) / entry["name"]).unlink(missing_ok=True)
+        save_archive_catalog(kept)
+
+        logger.info(f"Deleted {len(expired)} old log archives, {len(kept)} archives use {total / (1024 * 1024):.1f} MB")
     except Exception as e:
         logger.error(f"Error enforcing retention policy: {e}")
 
@@ -596,11 +3201,8 @@ def check_required_tools():
     """Check if required tools are available in the container"""
     tools = {"journalctl": "collecting system logs", "helm": "collecting Helm releases"}
 
-    missing_tools = []
-    for tool, purpose in tools.items():
-        success, _ = run_command(f"command -v {tool}", shell=True)
-        if not success:
-            missing_tools.append((tool, purpose))
+    tasks = {tool: partial(run_command, f"command -v {tool}", shell=True) for tool in tools}
+    missing_tools = [(tool, tools[tool]) for tool, (success, _) in run_parallel(tasks).items() if not success]
 
     if missing_tools:
         logger.warning("Some tools required by Nessie are not available in this container:")
@@ -611,21 +3213,602 @@ def check_required_tools():
     return len(missing_tools) == 0
 
 
+class Collector:
+    """A collection phase that main() schedules
+
+    collect is called with the collection context (API clients, writer and incremental
+    state) and returns the phase's data, stored under name. requires lists context entries
+    that must be available, and after lists collectors that must have finished first.
+    """
+
+    def __init__(self, name, title, collect, skip=False, requires=(), after=()):
+        self.name = name
+        self.title = title
+        self.collect = collect
+        self.skip = skip
+        self.requires = tuple(requires)
+        self.after = tuple(after)
+
+
+# Context entries a collector can require, with how to describe them when missing
+COLLECTOR_REQUIREMENTS = {
+    "v1_api": "Kubernetes API client",
+    "custom_api": "Kubernetes Custom API client",
+}
+
+COLLECTORS = {}
+
+
+def register_collector(collector):
+    """Adds a collector to the registry, replacing any collector with the same name"""
+    COLLECTORS[collector.name] = collector
+    return collector
+
+
+def journal_writer(ctx):
+    """Journals in the json/export modes are always streamed to disk"""
+    return ctx["stream_writer"] if JOURNAL_MODE == "text" else ctx["writer"]
+
+
+register_collector(
+    Collector(
+        "journals",
+        "unit journals",
+        lambda ctx: collect_unit_journals(ctx["writer"], ctx["state"]),
+        skip=JOURNAL_MODE == "text" or ((SKIP_NODE_LOGS or COORDINATOR) and SKIP_K8S_CONFIGS),
+    )
+)
+register_collector(
+    Collector(
+        "node_logs",
+        "node logs",
+        lambda ctx: collect_node_logs(journal_writer(ctx), ctx["state"], ctx["data"].get("journals")),
+        skip=SKIP_NODE_LOGS or COORDINATOR,
+        after=["journals"],
+    )
+)
+register_collector(
+    Collector(
+        "k8s_configs",
+        "Kubernetes configuration",
+        lambda ctx: collect_k8s_configs(ctx["v1_api"], journal_writer(ctx), ctx["state"], ctx["data"].get("journals")),
+        skip=SKIP_K8S_CONFIGS,
+        requires=["v1_api"],
+        after=["journals"],
+    )
+)
+register_collector(
+    Collector(
+        "host_file_logs",
+        "host file logs",
+        lambda ctx: collect_host_file_logs(ctx["writer"]),
+        skip=SKIP_HOST_FILE_LOGS or COORDINATOR,
+    )
+)
+register_collector(
+    Collector(
+        "nodes",
+        "node logs from every node",
+        lambda ctx: collect_cluster_nodes(ctx["v1_api"], ctx["writer"]),
+        skip=not COORDINATOR or (SKIP_NODE_LOGS and SKIP_HOST_FILE_LOGS),
+        requires=["v1_api"],
+    )
+)
+register_collector(
+    Collector(
+        "pod_logs",
+        "pod logs",
+        lambda ctx: collect_pod_logs(ctx["v1_api"], ctx["stream_writer"], ctx["state"]),
+        skip=SKIP_POD_LOGS,
+        requires=["v1_api"],
+    )
+)
+register_collector(
+    Collector(
+        "node_metrics",
+        "node metrics",
+        lambda ctx: collect_node_metrics(ctx["custom_api"]),
+        skip=SKIP_METRICS,
+        requires=["custom_api"],
+    )
+)
+register_collector(
+    Collector(
+        "versions",
+        "version information",
+        lambda ctx: collect_versions(ctx["v1_api"].api_client if ctx["v1_api"] else None),
+        skip=SKIP_VERSIONS,
+    )
+)
+
+
+def run_collector(collector, context):
+    """Runs a single collector, turning any failure into an error entry"""
+    logger.info(f"Collecting {collector.title}")
+    try:
+        with telemetry.phase(collector.name):
+            return collector.collect(context)
+    except Exception as e:
+        logger.error(f"Collection of {collector.title} failed: {e}")
+        return {"error": str(e)}
+
+
+def run_collectors(collectors, context):
+    """Runs the collectors, with independent ones in parallel up to COLLECTOR_WORKERS
+
+    Skipped collectors and those missing a required context entry are left out of the
+    returned data. A collector starts once everything in its after list has finished
+    or been left out, and can read their results from context["data"]. Results are
+    returned in registration order.
+    """
+    results = context["data"] = {}
+    waiting = {}
+    for name, collector in collectors.items():
+        missing = [key for key in collector.requires if context.get(key) is None]
+        if collector.skip:
+            logger.info(f"Skipping {collector.title} collection")
+        elif missing:
+            reasons = ", ".join(COLLECTOR_REQUIREMENTS.get(key, key) for key in missing)
+            logger.error(f"{reasons} not available, skipping {collector.title} collection")
+        else:
+            waiting[name] = collector
+
+    running = {}
+    with ThreadPoolExecutor(max_workers=COLLECTOR_WORKERS) as executor:
+        while waiting or running:
+            ready = [
+                name
+                for name, collector in waiting.items()
+                if not any(dependency in waiting or dependency in running.values() for dependency in collector.after)
+            ]
+            if not ready and not running:
+                logger.error(f"Collector dependencies cannot be satisfied, skipping: {', '.join(waiting)}")
+                break
+            for name in ready:
+                running[executor.submit(run_collector, waiting.pop(name), context)] = name
+
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+    return {name: results[name] for name in collectors if name in results}
+
+
+def log_timestamp_key(timestamp):
+    """Returns a sortable key for an RFC 3339 UTC timestamp with up to nanosecond precision"""
+    seconds, _, fraction = timestamp.rstrip(b"Z").partition(b".")
+    return seconds + b"." + fraction.ljust(9, b"0")
+
+
+class ContainerLogBuffer:
+    """Ring buffer of the last DAEMON_BUFFER_LINES lines of one container's log
+
+    Lines arrive from a followed log stream with timestamps, which are used to skip the
+    overlap when the stream is reopened and stripped before the line is stored, unless
+    the timeline needs them.
+    """
+
+    def __init__(self, lines):
+        self.lines = deque(maxlen=lines)
+        self.partial = b""
+        self.last_timestamp = None
+        self.last_seen = None
+        self.followed = False
+        self._lock = threading.Lock()
+
+    def _add(self, line):
+        timestamp, _, message = line.partition(b" ")
+        key = log_timestamp_key(timestamp)
+        if self.last_timestamp is not None and key <= self.last_timestamp:
+            return
+        self.last_timestamp = key
+        self.lines.append((line if TIMELINE else message) + b"\n")
+
+    def feed(self, chunk):
+        """Adds a chunk of the stream, holding back a trailing partial line until it completes"""
+        with self._lock:
+            *complete, self.partial = (self.partial + chunk).split(b"\n")
+            for line in complete:
+                self._add(line)
+            self.last_seen = time.time()
+
+    def end_stream(self):
+        """Keeps a last line that the stream ended without terminating"""
+        with self._lock:
+            if self.partial:
+                self._add(self.partial)
+                self.partial = b""
+
+    def contents(self):
+        with self._lock:
+            return b"".join(self.lines)
+
+
+class PodLogDaemon:
+    """Follows the log of every container into a ring buffer while watching pods come and go
+
+    Pods are tracked by UID, so the logs of a deleted pod stay available to snapshots for
+    DAEMON_DELETED_POD_TTL seconds, even after a new pod with the same name replaces it.
+    At most DAEMON_MAX_STREAMS logs are followed at once; the rest wait for a free stream
+    and are fetched the regular way if a snapshot is taken in the meantime.
+    """
+
+    def __init__(self, v1_api):
+        self.v1_api = v1_api
+        self.pods = {}
+        self.buffers = {}
+        self.waiting = deque()
+        self.streams = 0
+        self.started = datetime.now()
+        self.stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._warned_streams = False
+
+    def start(self):
+        for namespace in NAMESPACES_FILTER or [None]:
+            threading.Thread(target=self.watch_pods, args=(namespace,), daemon=True).start()
+
+    def stop(self):
+        self.stopping.set()
+
+    def watch_pods(self, namespace):
+        """Lists the pods of namespace (None for all) and follows their changes until stopped
+
+        The watch is reopened from a fresh listing whenever it times out or fails, which
+        also catches pods deleted while no watch was open.
+        """
+        if namespace:
+            list_pods, args = self.v1_api.list_namespaced_pod, (namespace,)
+        else:
+            list_pods, args = self.v1_api.list_pod_for_all_namespaces, ()
+        while not self.stopping.is_set():
+            try:
+                listing = list_pods(*args)
+                self.sync(namespace, listing.items)
+                for event in watch.Watch().stream(
+                    list_pods,
+                    *args,
+                    resource_version=listing.metadata.resource_version,
+                    timeout_seconds=DAEMON_WATCH_TIMEOUT,
+                ):
+                    if self.stopping.is_set():
+                        break
+                    if event["type"] == "DELETED":
+                        self.forget(event["object"].metadata.uid)
+                    elif event["type"] in ("ADDED", "MODIFIED"):
+                        self.track(event["object"])
+            except Exception as e:
+                logger.warning(f"Watching pods in {f'namespace {namespace}' if namespace else 'all namespaces'} failed: {e}")
+                self.stopping.wait(DAEMON_RETRY_DELAY)
+
+    def sync(self, namespace, pods):
+        """Tracks the listed pods and forgets pods of namespace that are no longer listed"""
+        listed = set()
+        for pod in pods:
+            self.track(pod)
+            listed.add(pod.metadata.uid)
+        with self._lock:
+            gone = [
+                uid
+                for uid, pod in self.pods.items()
+                if pod["deleted_at"] is None and uid not in listed and namespace in (None, pod["namespace"])
+            ]
+        for uid in gone:
+            self.forget(uid)
+
+    def track(self, pod):
+        """Starts following the containers of a new pod, or updates the phase of a known one"""
+        uid = pod.metadata.uid
+        phase = pod.status.phase if pod.status else None
+        with self._lock:
+            if uid in self.pods:
+                self.pods[uid]["phase"] = phase
+                return
+            containers = [c.name for c in pod.spec.containers]
+            self.pods[uid] = {
+                "namespace": pod.metadata.namespace,
+                "name": pod.metadata.name,
+                "containers": containers,
+                "phase": phase,
+                "deleted_at": None,
+            }
+            for container in containers:
+                self.buffers[(uid, container)] = ContainerLogBuffer(DAEMON_BUFFER_LINES)
+                self.waiting.append((uid, container))
+            self._start_followers()
+
+    def forget(self, uid):
+        """Marks a pod deleted, keeping its buffers for DAEMON_DELETED_POD_TTL seconds"""
+        with self._lock:
+            pod = self.pods.get(uid)
+            if pod and pod["deleted_at"] is None:
+                pod["deleted_at"] = time.time()
+                logger.info(f"Pod {pod['namespace']}/{pod['name']} was deleted, keeping its buffered logs")
+            self._prune()
+
+    def _prune(self):
+        expired = [
+            uid
+            for uid, pod in self.pods.items()
+            if pod["deleted_at"] is not None and time.time() - pod["deleted_at"] > DAEMON_DELETED_POD_TTL
+        ]
+        for uid in expired:
+            for container in self.pods.pop(uid)["containers"]:
+                del self.buffers[(uid, container)]
+
+    def _start_followers(self):
+        while self.waiting and self.streams < DAEMON_MAX_STREAMS:
+            uid, container = self.waiting.popleft()
+            pod = self.pods.get(uid)
+            if pod is None or pod["deleted_at"] is not None:
+                continue
+            self.streams += 1
+            self.buffers[(uid, container)].followed = True
+            threading.Thread(target=self.follow, args=(uid, container), daemon=True).start()
+        if self.waiting and not self._warned_streams:
+            logger.warning(
+                f"Following the maximum of {DAEMON_MAX_STREAMS} container logs, "
+                "raise NESSIE_DAEMON_MAX_STREAMS to buffer the others"
+            )
+            self._warned_streams = True
+
+    def follow(self, uid, container):
+        """Streams one container's log into its buffer until the pod is deleted or has finished
+
+        The stream ends whenever the container exits, so it is reopened with a little overlap
+        to pick up the restarted container, backing off while the container is not running.
+        """
+        pod = self.pods[uid]
+        buffer = self.buffers[(uid, container)]
+        delay = DAEMON_RETRY_DELAY
+        try:
+            while not self.stopping.is_set() and pod["deleted_at"] is None:
+                log_args = {
+                    "name": pod["name"],
+                    "namespace": pod["namespace"],
+                    "container": container,
+                    "follow": True,
+                    "timestamps": True,
+                }
+                if buffer.last_seen is None:
+                    log_args["tail_lines"] = DAEMON_BUFFER_LINES
+                else:
+                    log_args["since_seconds"] = int(time.time() - buffer.last_seen) + 1
+                try:
+                    response = self.v1_api.read_namespaced_pod_log(**log_args, _preload_content=False)
+                    try:
+                        for chunk in response.stream(STREAM_CHUNK_SIZE):
+                            buffer.feed(chunk)
+                            delay = DAEMON_RETRY_DELAY
+                    finally:
+                        response.release_conn()
+                    buffer.end_stream()
+                except Exception as e:
+                    logger.debug(f"Following {pod['namespace']}/{pod['name']}/{container} failed: {e}")
+                if pod["phase"] in ("Succeeded", "Failed"):
+                    break
+                self.stopping.wait(delay)
+                delay = min(delay * 2, DAEMON_MAX_RETRY_DELAY)
+        finally:
+            with self._lock:
+                self.streams -= 1
+                self._start_followers()
+
+    def status(self):
+        """Returns counts describing what the daemon is currently buffering"""
+        with self._lock:
+            return {
+                "started": self.started.isoformat(),
+                "live_pods": sum(1 for pod in self.pods.values() if pod["deleted_at"] is None),
+                "deleted_pods": sum(1 for pod in self.pods.values() if pod["deleted_at"] is not None),
+                "followed_containers": self.streams,
+                "waiting_containers": len(self.waiting),
+                "buffered_lines": sum(len(buffer.lines) for buffer in self.buffers.values()),
+            }
+
+    def write_buffer(self, writer, relpath, buffer):
+        return True, writer.write(relpath, [buffer.contents()])
+
+    def collect_pod_logs(self, writer):
+        """Writes the buffered container logs through writer, returning collect_pod_logs()-style data
+
+        A deleted pod whose name a live pod has taken over is saved under its name and the
+        start of its UID. Containers that were never followed are fetched now.
+        """
+        with self._lock:
+            self._prune()
+            pods = {uid: dict(pod) for uid, pod in self.pods.items()}
+            buffers = dict(self.buffers)
+        live = {f"{pod['namespace']}/{pod['name']}" for pod in pods.values() if pod["deleted_at"] is None}
+
+        pod_logs = {}
+        deleted_pods = {}
+        tasks = {}
+        for uid, pod in pods.items():
+            pod_key = f"{pod['namespace']}/{pod['name']}"
+            if pod["deleted_at"] is not None:
+                if pod_key in live:
+                    pod_key = f"{pod_key}.{uid[:8]}"
+                deleted_pods[pod_key] = datetime.fromtimestamp(pod["deleted_at"]).isoformat()
+            pod_logs[pod_key] = dict.fromkeys(pod["containers"])
+            for container in pod["containers"]:
+                buffer = buffers[(uid, container)]
+                if buffer.followed:
+                    relpath = f"pods/{pod_key}_{container}.log"
+                    tasks[(pod_key, container)] = partial(self.write_buffer, writer, relpath, buffer)
+                elif pod["deleted_at"] is None:
+                    tasks[(pod_key, container)] = partial(
+                        fetch_container_log, self.v1_api, pod["namespace"], pod["name"], container, writer
+                    )
+                else:
+                    pod_logs[pod_key][container] = "Error: the pod was deleted before its log could be followed"
+
+        with ThreadPoolExecutor(max_workers=POD_LOG_WORKERS) as executor:
+            futures = {executor.submit(task): key for key, task in tasks.items()}
+            for future in as_completed(futures):
+                pod_key, container = futures[future]
+                try:
+                    pod_logs[pod_key][container] = future.result()[1]
+                except Exception as e:
+                    pod_logs[pod_key][container] = f"Error: {e}"
+
+        status = self.status()
+        status["deleted_pod_logs"] = deleted_pods
+        writer.write_text("daemon.yaml", yaml.dump(status, default_flow_style=False))
+        logger.info(f"Snapshot of {len(pod_logs)} pods, {len(deleted_pods)} of them deleted")
+        return pod_logs
+
+    def take_snapshot(self, custom_api):
+        """Runs a regular collection with the pod logs taken from the buffers
+
+        Returns the exit code and archive path of the collection. Snapshots requested while
+        one is running wait for it to finish.
+        """
+        with self._snapshot_lock:
+            start_time = time.time()
+            telemetry.reset()
+            logger.info("Taking a snapshot of the buffered pod logs")
+            collectors = dict(COLLECTORS)
+            collectors["pod_logs"] = Collector(
+                "pod_logs", "buffered pod logs", lambda ctx: self.collect_pod_logs(ctx["writer"])
+            )
+            return collect(self.v1_api, custom_api, collectors, start_time)
+
+
+class SnapshotRequestHandler(BaseHTTPRequestHandler):
+    """Local HTTP endpoint of daemon mode: POST /snapshot takes a snapshot, GET /status reports"""
+
+    def log_message(self, format, *args):
+        logger.debug(f"Snapshot endpoint: {format % args}")
+
+    def send_json(self, status, body):
+        payload = (json.dumps(body) + "\n").encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path != "/status":
+            return self.send_json(404, {"error": "not found"})
+        self.send_json(200, self.server.pod_log_daemon.status())
+
+    def do_POST(self):
+        if self.path != "/snapshot":
+            return self.send_json(404, {"error": "not found"})
+        exit_code, archive_file = self.server.pod_log_daemon.take_snapshot(self.server.custom_api)
+        if exit_code or not archive_file:
+            return self.send_json(500, {"error": "snapshot failed, see the Nessie log"})
+        self.send_json(200, {"archive": archive_file})
+
+
+def run_daemon(v1_api, custom_api):
+    """Buffers pod logs until SIGTERM or SIGINT, taking a snapshot on SIGUSR1 or POST /snapshot
+
+    Signal handlers only set flags, which the main thread polls, so that they never
+    run into a lock held by the code they interrupted.
+    """
+    if v1_api is None:
+        logger.error("Daemon mode needs the Kubernetes API client, exiting")
+        return 1
+    if SKIP_POD_LOGS:
+        logger.error("Daemon mode buffers pod logs, which NESSIE_SKIP_POD_LOGS turns off, exiting")
+        return 1
+
+    flags = {"snapshot": False, "stop": False}
+
+    def request_snapshot(signum, frame):
+        flags["snapshot"] = True
+
+    def request_stop(signum, frame):
+        flags["stop"] = True
+
+    signal.signal(signal.SIGUSR1, request_snapshot)
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+
+    daemon = PodLogDaemon(v1_api)
+    daemon.start()
+
+    server = None
+    if DAEMON_PORT:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", DAEMON_PORT), SnapshotRequestHandler)
+        except OSError as e:
+            logger.error(f"Cannot listen for snapshot requests on 127.0.0.1:{DAEMON_PORT}: {e}")
+            daemon.stop()
+            return 1
+        server.daemon_threads = True
+        server.pod_log_daemon = daemon
+        server.custom_api = custom_api
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(
+        f"Daemon mode: buffering the last {DAEMON_BUFFER_LINES} lines per container, send SIGUSR1 to pid {os.getpid()}"
+        + (f" or POST http://127.0.0.1:{DAEMON_PORT}/snapshot" if server else "")
+        + " for a snapshot"
+    )
+
+    while not flags["stop"]:
+        if flags["snapshot"]:
+            flags["snapshot"] = False
+            daemon.take_snapshot(custom_api)
+        else:
+            time.sleep(DAEMON_SIGNAL_POLL)
+
+    logger.info("Stopping daemon mode")
+    daemon.stop()
+    if server:
+        server.shutdown()
+        server.server_close()
+    return 0
+
+
+def hand_over_archive(archive_file):
+    """Publishes a node agent's archive path for the coordinator and waits to be stopped
+
+    The coordinator copies the archive out of the pod and then deletes the Job, which
+    stops the agent with SIGTERM.
+    """
+    ready_file = Path(LOG_DIR) / NODE_AGENT_READY_FILE
+    ready_file.write_text(f"{archive_file or ''}\n")
+    logger.info(f"Waiting for the coordinator to copy {archive_file}")
+
+    flags = {"stop": False}
+
+    def request_stop(signum, frame):
+        flags["stop"] = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    while not flags["stop"]:
+        time.sleep(DAEMON_SIGNAL_POLL)
+    return 0 if archive_file else 1
+
+
 def main():
     """Orchestrates log collection with fault tolerance"""
     start_time = time.time()
+    telemetry.reset()
     logger.info("Starting log collection process")
 
     # Log configuration
     logger.info(f"Configuration: LOG_DIR={LOG_DIR}, ZIP_DIR={ZIP_DIR}, RETENTION_DAYS={RETENTION_DAYS}")
-    logger.info(f"Configuration: MAX_POD_LOG_LINES={MAX_POD_LOG_LINES}, NAMESPACES_FILTER={NAMESPACES_FILTER}")
+    logger.info(
+        f"Configuration: MAX_POD_LOG_LINES={MAX_POD_LOG_LINES}, POD_LOG_WORKERS={POD_LOG_WORKERS}, NAMESPACES_FILTER={NAMESPACES_FILTER}"
+    )
+    logger.info(
+        f"Configuration: STREAM_LOGS={STREAM_LOGS}, SINGLE_PASS_ARCHIVE={SINGLE_PASS_ARCHIVE}, SKIP_RAW_DIR={SKIP_RAW_DIR}"
+    )
+    logger.info(f"Configuration: COMPRESSION={COMPRESSION}, COMPRESSION_THREADS={COMPRESSION_THREADS}")
+    logger.info(f"Configuration: INCREMENTAL={INCREMENTAL}, STATE_FILE={STATE_FILE}")
+    logger.info(f"Configuration: JOURNAL_MODE={JOURNAL_MODE}, JOURNAL_SINCE={JOURNAL_SINCE}, JOURNAL_UNTIL={JOURNAL_UNTIL}")
+    logger.info(f"Configuration: COLLECTOR_WORKERS={COLLECTOR_WORKERS}, COMMAND_WORKERS={COMMAND_WORKERS}")
     logger.info(
         f"Skip settings: NODE_LOGS={SKIP_NODE_LOGS}, POD_LOGS={SKIP_POD_LOGS}, K8S_CONFIGS={SKIP_K8S_CONFIGS}, METRICS={SKIP_METRICS}, VERSIONS={SKIP_VERSIONS}, HOST_FILE_LOGS={SKIP_HOST_FILE_LOGS}"
     )
 
-    # Initialize data dictionary
-    data = {}
-
     # Check prerequisites (continue even if they fail)
     prerequisites_met = True
     if not ensure_directories():
@@ -642,103 +3825,153 @@ def main():
     # Setup Kubernetes clients
     v1_api, custom_api = setup_kubernetes_client()
 
-    # Collect node logs if not skipped
-    if not SKIP_NODE_LOGS:
-        try:
-            logger.info("Collecting node logs")
-            data["node_logs"] = collect_node_logs()
-        except Exception as e:
-            logger.error(f"Node log collection failed: {e}")
-            data["node_logs"] = {"error": str(e)}
-    else:
-        logger.info("Skipping node logs collection")
+    if DAEMON:
+        return run_daemon(v1_api, custom_api)
 
-    # Collect K8s configs if not skipped and API client is available
-    if not SKIP_K8S_CONFIGS and v1_api:
-        try:
-            logger.info("Collecting Kubernetes configurations")
-            data["k8s_configs"] = collect_k8s_configs(v1_api)
-        except Exception as e:
-            logger.error(f"Kubernetes configuration collection failed: {e}")
-            data["k8s_configs"] = {"error": str(e)}
-    elif SKIP_K8S_CONFIGS:
-        logger.info("Skipping Kubernetes configuration collection")
-    else:
-        logger.error("Kubernetes API client not available, skipping K8s configuration collection")
+    exit_code, archive_file = collect(v1_api, custom_api, COLLECTORS, start_time)
+    if NODE_AGENT:
+        return hand_over_archive(archive_file)
+    return exit_code
 
-    # Collect host file logs if not skipped
-    if not SKIP_HOST_FILE_LOGS:
-        try:
-            logger.info("Collecting host file logs")
-            data["host_file_logs"] = collect_host_file_logs()
-        except Exception as e:
-            logger.error(f"Host file log collection failed: {e}")
-            data["host_file_logs"] = {"error": str(e)}
-    else:
-        logger.info("Skipping host file log collection")
 
-    # Collect pod logs if not skipped and API client is available
-    if not SKIP_POD_LOGS and v1_api:
+def collect(v1_api, custom_api, collectors, start_time):
+    """Runs collectors and saves, summarizes and archives their data
+
+    Returns the exit code and the path of the archive, if one was created.
+    """
+    # Set up the output writer up front so streaming collectors can write into it
+    if SKIP_RAW_DIR and not SINGLE_PASS_ARCHIVE:
+        logger.warning("NESSIE_SKIP_RAW_DIR requires NESSIE_SINGLE_PASS_ARCHIVE, keeping the raw data directory")
+    keep_raw = not (SKIP_RAW_DIR and SINGLE_PASS_ARCHIVE)
+    try:
+        collection_dir = reserve_collection_dir(keep_raw)
+        archive_path = Path(ZIP_DIR) / f"{collection_dir.name}{ARCHIVE_EXTENSION}" if SINGLE_PASS_ARCHIVE else None
+        budget = ByteBudget(MAX_LOG_SIZE, LOG_SIZE_WEIGHTS) if LOG_SIZE_WEIGHTS else None
+        redactor = Redactor(REDACT_WORKERS) if REDACT else None
+        writer = CollectionWriter(
+            collection_dir,
+            archive_path,
+            keep_raw=keep_raw,
+            budget=budget,
+            dedup=DEDUP,
+            redactor=redactor,
+            error_index=ErrorIndex() if ERROR_INDEX else None,
+        )
+    except Exception as e:
+        logger.error(f"Failed to set up collection output: {e}")
+        return 1, None
+    state = load_collection_state() if INCREMENTAL else None
+    previous_log_times = dict(state["container_log_times"]) if state is not None else {}
+
+    # Run the registered collectors, independent phases concurrently
+    context = {
+        "v1_api": v1_api,
+        "custom_api": custom_api,
+        "writer": writer,
+        "stream_writer": writer if STREAM_LOGS else None,
+        "state": state,
+    }
+    data = run_collectors(collectors, context)
+
+    # Save collected data as individual text files
+    try:
+        with telemetry.phase("save"):
+            created_files, collection_dir = save_text_logs(data, writer)
+        logger.info(f"Data saved to {collection_dir} ({len(created_files)} files)")
+    except Exception as e:
+        logger.error(f"Failed to save log files: {e}")
+        writer.abort()
+        return 1, None
+    finally:
+        # Collected data is all written; what follows is Nessie's own output
+        if writer.redactor:
+            writer.redactor.close()
+
+    if writer.redactor:
+        report = writer.redactor.report()
+        logger.info(f"Redacted {report['total']} secrets in {len(report['files'])} files")
+
+    # Ship the error-signature index so triage can go straight to the lines that matter
+    if writer.error_index:
         try:
-            logger.info("Collecting pod logs")
-            data["pod_logs"] = collect_pod_logs(v1_api)
+            writer.write(ERROR_INDEX_FILE, [writer.error_index.to_json().encode()])
         except Exception as e:
-            logger.error(f"Pod log collection failed: {e}")
-            data["pod_logs"] = {"error": str(e)}
-    elif SKIP_POD_LOGS:
-        logger.info("Skipping pod logs collection")
-    else:
-        logger.error("Kubernetes API client not available, skipping pod logs collection")
+            logger.error(f"Failed to write the error index: {e}")
 
-    # Collect node metrics if not skipped and API client is available
-    if not SKIP_METRICS and custom_api:
+    # Merge every collected log into one timeline, reading back the files written above
+    if TIMELINE:
+        if not writer.keep_raw:
+            logger.warning("NESSIE_TIMELINE needs the raw data directory, skipping the timeline")
+        else:
+            try:
+                with telemetry.phase("timeline"):
+                    writer.write(TIMELINE_FILE, build_timeline(writer), limit=False)
+                logger.info(f"Timeline written to {writer.path(TIMELINE_FILE)}")
+            except Exception as e:
+                logger.error(f"Failed to write the timeline: {e}")
+
+    # Record which files are references to identical content stored once
+    if writer.duplicates:
         try:
-            logger.info("Collecting node metrics")
-            data["node_metrics"] = collect_node_metrics(custom_api)
+            digests = {first: digest for digest, first in writer.blobs.items()}
+            manifest = {
+                "algorithm": "sha256",
+                "duplicates": {
+                    relpath: {"same_as": original, "sha256": digests[original]}
+                    for relpath, original in writer.duplicates.items()
+                },
+            }
+            writer.write_text("dedup_manifest.yaml", yaml.dump(manifest, default_flow_style=False))
+            report = writer.dedup_report()
+            logger.info(
+                f"Deduplicated {report['duplicate_files']} files, saving {report['bytes_saved'] / (1024 * 1024):.1f} MB"
+            )
         except Exception as e:
-            logger.error(f"Node metrics collection failed: {e}")
-            data["node_metrics"] = {"error": str(e)}
-    elif SKIP_METRICS:
-        logger.info("Skipping node metrics collection")
-    else:
-        logger.error("Kubernetes Custom API client not available, skipping node metrics collection")
+            logger.error(f"Failed to write deduplication manifest: {e}")
 
-    # Collect version information if not skipped
-    if not SKIP_VERSIONS:
+    # Persist high-water marks only once the collected data is safely written
+    if state is not None:
         try:
-            logger.info("Collecting version information")
-            data["versions"] = collect_versions()
+            if writer.budget:
+                restore_truncated_log_times(state, previous_log_times, writer.budget.truncated)
+            save_collection_state(state)
         except Exception as e:
-            logger.error(f"Version collection failed: {e}")
-            data["versions"] = {"error": str(e)}
-    else:
-        logger.info("Skipping version information collection")
+            logger.error(f"Failed to save incremental state: {e}")
 
-    # Save collected data as individual text files
+    # Create summary report (appended last in single-pass mode)
     try:
-        created_files, collection_dir = save_text_logs(data, LOG_DIR)
-        logger.info(f"Data saved to {collection_dir} ({len(created_files)} files)")
-    except Exception as e:
-        logger.error(f"Failed to save log files: {e}")
-        return 1
-
-    # Create summary report
-    try:
-        summary_file = create_summary_report(data, start_time, collection_dir)
+        summary_file = create_summary_report(data, start_time, writer)
         logger.info(f"Summary report created at {summary_file}")
     except Exception as e:
         logger.error(f"Failed to create summary report: {e}")
         summary_file = None
 
-    # Create compressed archive
+    # Ship a checksummed listing of every file so the archive can be verified after transfer
+    try:
+        writer.write("manifest.tsv", writer.manifest_lines())
+    except Exception as e:
+        logger.error(f"Failed to write the file manifest: {e}")
+
+    # Create compressed archive, or finalize the one written during collection
     try:
-        archive_file = zip_logs(collection_dir, ZIP_DIR)
+        with telemetry.phase("archive"):
+            if SINGLE_PASS_ARCHIVE:
+                archive_file = writer.close()
+            else:
+                archive_file = zip_logs(collection_dir, ZIP_DIR)
         if archive_file:
             logger.info(f"Archive created at {archive_file}")
     except Exception as e:
         logger.error(f"Failed to create archive: {e}")
         archive_file = None
 
+    # Record the archive in the catalog that retention works from
+    if archive_file:
+        try:
+            catalog_archive(archive_file, collection_stats(data, writer))
+        except Exception as e:
+            logger.error(f"Failed to add the archive to the catalog: {e}")
+
     # Clean up old archives
     try:
         enforce_retention()
@@ -747,6 +3980,16 @@ def main():
 
     # Calculate total execution time
     total_time = time.time() - start_time
+
+    # Export telemetry for the node exporter textfile collector
+    if PROMETHEUS_TEXTFILE:
+        try:
+            prometheus_file = write_prometheus_textfile(
+                PROMETHEUS_TEXTFILE, telemetry.report(writer.source_totals), total_time, archive_file
+            )
+            logger.info(f"Prometheus metrics written to {prometheus_file}")
+        except Exception as e:
+            logger.error(f"Failed to write Prometheus metrics: {e}")
     minutes, seconds = divmod(total_time, 60)
 
     # Print a comprehensive summary of the collection
@@ -766,14 +4009,15 @@ def main():
     else:
         logger.info("  • System logs: Not collected")
 
-    if "pod_logs" in data and "error" not in data["pod_logs"]:
-        pod_count = len(data["pod_logs"])
-        namespaces = set()
-        for pod_key in data["pod_logs"].keys():
-            if "/" in pod_key:
-                namespace = pod_key.split("/")[0]
-                namespaces.add(namespace)
-        logger.info(f"  • Pod logs: {pod_count} pods from {len(namespaces)} namespaces")
+    if "nodes" in data:
+        collected_nodes = [node for node, result in data["nodes"].items() if "error" not in result]
+        logger.info(f"  • Nodes: {len(collected_nodes)}/{len(data['nodes'])} collected")
+
+    pod_keys = [pod_key for pod_key in data.get("pod_logs", {}) if "/" in pod_key]
+    if "pod_logs" in data and (pod_keys or "error" not in data["pod_logs"]):
+        namespaces = {pod_key.split("/")[0] for pod_key in pod_keys}
+        incomplete = " (listing incomplete)" if "error" in data["pod_logs"] else ""
+        logger.info(f"  • Pod logs: {len(pod_keys)} pods from {len(namespaces)} namespaces{incomplete}")
     else:
         logger.info("  • Pod logs: Not collected")
 
@@ -806,11 +4050,11 @@ def main():
 
     # Output location
     logger.info("\n📁 OUTPUT LOCATION:")
-    if "archive_file" in locals() and archive_file:
+    if archive_file:
         logger.info(f"  • Archive: {archive_file}")
-    if "collection_dir" in locals() and collection_dir:
+    if keep_raw and collection_dir:
         logger.info(f"  • Raw data directory: {collection_dir}")
-    if "summary_file" in locals() and summary_file:
+    if keep_raw and summary_file:
         logger.info(f"  • Summary YAML: {summary_file}")
 
     # Any issues or notes
@@ -834,11 +4078,13 @@ def main():
     logger.info("Collection complete! Use the archive file for sharing with support.")
     logger.info("=" * 80 + "\n")
 
-    return 0
+    return 0, archive_file
 
 
 if __name__ == "__main__":
     try:
+        if sys.argv[1:2] == ["extract"]:
+            exit(extract_main(sys.argv[2:]))
         exit_code = main()
         exit(exit_code)
     except Exception as e: